@@ -0,0 +1,93 @@
+"""Бенчмарк пропускной способности загрузки и разбора в зависимости от размера пула.
+
+Поднимает локальный сервер с сохраненными страницами товаров и прогоняет
+стадии fetch -> parse конвейера ParserService для разного числа процессов
+разбора. На многоядерной машине число товаров в секунду растет вместе с
+числом процессов, пока не упрется в ядра или в загрузку.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_parse_pool --pages 400 --processes 0 1 2 4 8
+"""
+import argparse
+import asyncio
+import time
+from itertools import cycle
+from pathlib import Path
+
+from benchmarks.stub_server import StubServer
+from src.core.settings import settings
+from src.scrapers.http_client import http_client
+from src.scrapers.rate_limiter import rate_limiter
+from src.scrapers.scraper import PageScraper
+from src.services.parse_pool import ParsePool
+from src.services.pipeline import CrawlPipeline
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+async def crawl(base_url: str, pages: int, processes: int) -> float:
+    settings.parse_processes = processes
+    # Примитивы синхронизации лимитера привязаны к event loop предыдущего прогона
+    rate_limiter._buckets.clear()
+    pool = ParsePool()
+    pool.start()
+    scraper = PageScraper()
+    parsed = []
+
+    async def fetch(path, emit):
+        result = await scraper.fetch(base_url + path)
+        await emit(result)
+
+    async def parse(result, emit):
+        await emit(await pool.parse(result))
+
+    async def sink(product, emit):
+        parsed.append(product.article)
+
+    pipeline = CrawlPipeline()
+    pipeline.add_stage('fetch', fetch, settings.fetch_workers, settings.pipeline_queue_size)
+    pipeline.add_stage('parse', parse, max(1, processes * 2), settings.pipeline_queue_size)
+    pipeline.add_stage('save', sink, 1, settings.pipeline_queue_size)
+
+    await http_client.connect()
+    try:
+        started = time.perf_counter()
+        await pipeline.run(f'/p/{i}/' for i in range(pages))
+        elapsed = time.perf_counter() - started
+    finally:
+        pool.shutdown()
+        await http_client.disconnect()
+
+    assert len(parsed) == pages, f'разобрано {len(parsed)} из {pages}'
+    return pages / elapsed
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--pages', type=int, default=400)
+    arg_parser.add_argument('--processes', type=int, nargs='+', default=[0, 1, 2, 4])
+    args = arg_parser.parse_args()
+
+    # Локальному серверу вежливость не нужна: измеряем только наш код
+    settings.rate_limit_rps = 1_000_000
+    settings.rate_limit_burst = 1_000_000
+    settings.rate_limit_max_in_flight = 64
+    settings.http_max_connections = 64
+    settings.http_max_keepalive_connections = 64
+    settings.fetch_workers = 32
+
+    fixtures = sorted(path.name for path in FIXTURES_DIR.glob('product_*.html'))
+    routes = {f'/p/{i}/': name for i, name in zip(range(args.pages), cycle(fixtures))}
+
+    print(f"бэкенд: {settings.html_backend}, страниц: {args.pages}")
+    print(f"{'процессов':>10}{'товаров/с':>12}{'ускорение':>12}")
+    baseline = None
+    with StubServer(routes) as base_url:
+        for processes in args.processes:
+            rate = asyncio.run(crawl(base_url, args.pages, processes))
+            baseline = baseline or rate
+            print(f"{processes:>10}{rate:>12.1f}{rate / baseline:>11.2f}x")
+
+
+if __name__ == '__main__':
+    main()
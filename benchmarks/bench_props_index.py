@@ -0,0 +1,108 @@
+"""Микробенчмарк индекса характеристик ProductFeatureParser.
+
+Сравнивает прежний способ (поиск таблицы props_list и проход по всем ее
+строкам в каждом _extract_*) с однократным построением индекса на
+сохраненных страницах товаров из benchmarks/fixtures.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_props_index --rounds 200
+"""
+import argparse
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from src.parsers.html_backend import SoupNode
+from src.parsers.product_feature import ProductFeatureParser
+from src.schemas.product import Attribute
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def legacy_lookup(soup: BeautifulSoup, wanted: str):
+    """Прежний поиск: таблица props_list и полный проход по строкам на каждое поле"""
+    props_table = soup.find('table', class_='props_list')
+    if props_table:
+        for row in props_table.find_all('tr'):
+            name_cell = row.find('td', class_='char_name')
+            value_cell = row.find('td', class_='char_value')
+            if name_cell and value_cell and name_cell.get_text(strip=True) == wanted:
+                return value_cell.get_text(strip=True)
+    return None
+
+
+def legacy_extract(soup: BeautifulSoup):
+    """Повторяет прежние _extract_* для полей из таблицы характеристик"""
+    # Артикул: таблица, затем meta sku, затем снова таблица (ШтрихКод)
+    if not legacy_lookup(soup, 'Артикул'):
+        meta_sku = soup.find('meta', {'itemprop': 'sku'})
+        if not (meta_sku and meta_sku.get('content')):
+            legacy_lookup(soup, 'ШтрихКод')
+
+    for wanted in ('Бренд', 'Производитель', 'Кол-во в упаковке'):
+        legacy_lookup(soup, wanted)
+
+    meta_category = soup.find('meta', {'itemprop': 'category'})
+    if not (meta_category and meta_category.get('content')):
+        legacy_lookup(soup, 'Категория товара')
+
+    # Атрибуты: отдельный проход по всем таблицам характеристик
+    attributes = []
+    for block in soup.find_all('div', class_='char_block'):
+        table = block.find('table', class_='props_list')
+        if not table:
+            continue
+        for row in table.find_all('tr'):
+            name_cell = row.find('td', class_='char_name')
+            value_cell = row.find('td', class_='char_value')
+            if name_cell and value_cell:
+                name_span = name_cell.find('span', {'itemprop': 'name'})
+                name = (name_span or name_cell).get_text(strip=True)
+                value_span = value_cell.find('span', {'itemprop': 'value'})
+                container = value_span or value_cell
+                value_link = container.find('a')
+                value = (value_link or container).get_text(strip=True)
+                if name and value:
+                    attributes.append(Attribute(attr_name=name, attr_value=value))
+
+
+def indexed_extract(parser: ProductFeatureParser, soup: BeautifulSoup):
+    soup = SoupNode(soup)
+    props = parser._build_props_index(soup)
+    parser._extract_article(soup, props)
+    parser._extract_brand(props)
+    parser._extract_country(props)
+    parser._extract_category(soup, props)
+    parser._extract_package_info(props)
+    parser._extract_attributes(props)
+
+
+def measure(func, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - started) / rounds
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--rounds', type=int, default=200)
+    args = arg_parser.parse_args()
+
+    parser = ProductFeatureParser()
+    print(f"{'страница':<28}{'прежний, мс':>14}{'индекс, мс':>14}{'ускорение':>12}{'parse_html, мс':>17}")
+
+    for path in sorted(FIXTURES_DIR.glob('product_*.html')):
+        html = path.read_text(encoding='utf-8')
+        soup = BeautifulSoup(html, 'html.parser')
+
+        legacy = measure(lambda: legacy_extract(soup), args.rounds)
+        indexed = measure(lambda: indexed_extract(parser, soup), args.rounds)
+        full = measure(lambda: parser.parse_html(html, 'https://kanc-mir.ru/'), max(1, args.rounds // 10))
+
+        print(f"{path.stem:<28}{legacy * 1000:>14.3f}{indexed * 1000:>14.3f}{legacy / indexed:>11.1f}x{full * 1000:>17.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Микробенчмарк представления товара на пути разбор -> пул процессов -> запись.
+
+Прежний путь: вложенные модели pydantic при разборе, model_dump() в
+процессе-воркере, Product.model_validate() в главном процессе и снова
+model_dump() при сохранении. Новый путь: ProductRecord при разборе,
+to_document() и одна проверка схемой при записи. Pickle имитирует
+передачу результата из пула. Записи строятся из товаров сохраненных
+страниц benchmarks/fixtures; заодно проверяется, что документы совпадают.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_record --rounds 20000
+"""
+import argparse
+import pickle
+import time
+from pathlib import Path
+
+from src.parsers.product_feature import ProductFeatureParser
+from src.schemas.product import Attribute, PriceInfo, Product, Supplier, SupplierOffer
+from src.schemas.record import SUPPLIER, ProductRecord
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def legacy_model(record: ProductRecord) -> Product:
+    """Товар так, как его прежде собирал ProductFeatureParser.parse_html"""
+    offers = [
+        SupplierOffer(
+            price=[PriceInfo(qnt=1, discount=0, price=offer.price)],
+            stock=offer.stock,
+            delivery_time=offer.delivery_time,
+            package_info=offer.package_info,
+            purchase_url=offer.purchase_url,
+        )
+        for offer in record.offers
+    ]
+    return Product(
+        title=record.title,
+        description=record.description,
+        article=record.article,
+        brand=record.brand,
+        country_of_origin=record.country_of_origin,
+        category=record.category,
+        created_at=record.created_at,
+        attributes=[Attribute(attr_name=name, attr_value=value) for name, value in record.attributes],
+        suppliers=[Supplier(
+            supplier_name=SUPPLIER['supplier_name'],
+            supplier_tel=SUPPLIER['supplier_tel'],
+            supplier_description=SUPPLIER['supplier_description'],
+            supplier_offers=offers,
+        )],
+    )
+
+
+def legacy_path(record: ProductRecord) -> dict:
+    data = pickle.loads(pickle.dumps(legacy_model(record).model_dump()))
+    return Product.model_validate(data).model_dump()
+
+
+def record_path(record: ProductRecord) -> dict:
+    product = pickle.loads(pickle.dumps(ProductRecord(
+        record.title, record.description, record.article, record.brand, record.country_of_origin,
+        record.category, list(record.attributes), list(record.offers), created_at=record.created_at,
+    )))
+    document = product.to_document()
+    Product.model_validate(document)
+    return document
+
+
+def measure(function, records, rounds: int) -> float:
+    started = time.perf_counter()
+    for index in range(rounds):
+        function(records[index % len(records)])
+    return (time.perf_counter() - started) / rounds * 1_000_000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--rounds', type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    parser = ProductFeatureParser()
+    records = [
+        parser.parse_html(path.read_text(encoding='utf-8'), 'https://kanc-mir.ru/')
+        for path in sorted(FIXTURES_DIR.glob('product_*.html'))
+    ]
+
+    for record in records:
+        if legacy_path(record) != record_path(record):
+            raise SystemExit(f"документ товара {record.article} отличается от прежнего")
+
+    legacy = measure(legacy_path, records, args.rounds)
+    lean = measure(record_path, records, args.rounds)
+    print(f"{'pydantic, мкс':>16}{'запись, мкс':>14}{'ускорение':>12}")
+    print(f"{legacy:>16.1f}{lean:>14.1f}{legacy / lean:>11.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Эталонный корпус страниц: проверка результатов разбора и замер скорости парсеров.
+
+Поднимает локальный сервер со страницами из benchmarks/fixtures и прогоняет
+через него StartPageParser.get_categories, CategoryPageParser.get_product_links
+(и товары листинга с ценой и наличием) и ProductFeatureParser.parse_product.
+Результат каждого парсера сравнивается с эталоном в benchmarks/golden/*.json,
+затем для каждой страницы печатаются страницы в секунду и пик памяти
+(tracemalloc) на один разбор. Завершается с кодом 1 при любом расхождении.
+
+Запуск из корня репозитория:
+    python -m benchmarks.golden
+    python -m benchmarks.golden --iterations 200
+    python -m benchmarks.golden --update    # перезаписать эталоны после намеренного изменения
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+from benchmarks.stub_server import StubServer
+from src.core.settings import settings
+from src.parsers.category import CategoryPageParser
+from src.parsers.product_feature import ProductFeatureParser
+from src.parsers.start_page import StartPageParser
+from src.scrapers.http_client import http_client
+from src.scrapers.rate_limiter import rate_limiter
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+GOLDEN_DIR = Path(__file__).parent / 'golden'
+
+# Путь на локальном сервере -> страница корпуса
+ROUTES = {
+    '/catalog/': 'start_page.html',
+    '/catalog/bumaga/': 'category_bumaga.html',
+    '/catalog/ruchki/': 'category_ruchki_last.html',
+    '/catalog/bumaga/bumaga_0/product_paper_a4/': 'product_paper_a4.html',
+    '/catalog/ruchki/ruchki_1/product_pen_gel/': 'product_pen_gel.html',
+    '/catalog/papki/papki_2/product_folder/': 'product_folder.html',
+}
+
+
+def relative(value: Any, base_url: str) -> Any:
+    """Убирает адрес локального сервера, чтобы эталон не зависел от порта"""
+    if isinstance(value, str):
+        return value[len(base_url):] if value.startswith(base_url) else value
+    if isinstance(value, list):
+        return [relative(item, base_url) for item in value]
+    if isinstance(value, dict):
+        return {key: relative(item, base_url) for key, item in value.items()}
+    return value
+
+
+@dataclass
+class Case:
+    """bench - вызов измеряемого парсера, snapshot - данные для сверки с эталоном"""
+    bench: Callable[[], Awaitable[Any]]
+    snapshot: Callable[[], Awaitable[Any]]
+
+
+def make_cases(base_url: str) -> Dict[str, Case]:
+    start_parser = StartPageParser()
+    category_parser = CategoryPageParser()
+    product_parser = ProductFeatureParser()
+    cases = {}
+
+    for path, fixture in ROUTES.items():
+        url = base_url + path
+        name = Path(fixture).stem
+
+        if fixture.startswith('start_'):
+            async def get_categories(url=url):
+                return await start_parser.get_categories(url)
+            cases[name] = Case(get_categories, get_categories)
+
+        elif fixture.startswith('category_'):
+            async def get_product_links(url=url):
+                return await category_parser.get_product_links(url)
+
+            async def listing_snapshot(url=url):
+                items = await category_parser.get_listing_items(url)
+                return {
+                    'product_links': await get_product_links(url),
+                    'items': [item.model_dump() for item in items],
+                }
+            cases[name] = Case(get_product_links, listing_snapshot)
+
+        else:
+            async def parse_product(url=url):
+                return await product_parser.parse_product(url)
+
+            async def product_snapshot(url=url):
+                product = await parse_product(url)
+                return {key: value for key, value in product.to_document().items() if key != 'created_at'}
+            cases[name] = Case(parse_product, product_snapshot)
+
+    return cases
+
+
+async def check(cases, base_url: str, update: bool) -> List[str]:
+    """Сверяет результаты с эталонами (или перезаписывает их). Возвращает имена расхождений"""
+    failures = []
+    GOLDEN_DIR.mkdir(exist_ok=True)
+
+    for name, case in cases.items():
+        actual = relative(await case.snapshot(), base_url)
+        golden_path = GOLDEN_DIR / f'{name}.json'
+
+        if update:
+            golden_path.write_text(json.dumps(actual, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+            print(f"эталон записан: {golden_path.name}")
+            continue
+
+        if not golden_path.exists():
+            failures.append(name)
+            print(f"FAIL {name}: нет эталона, запустите с --update")
+            continue
+
+        expected = json.loads(golden_path.read_text(encoding='utf-8'))
+        if actual == expected:
+            print(f"OK   {name}")
+        else:
+            failures.append(name)
+            print(f"FAIL {name}: результат разбора отличается от {golden_path.name}")
+            if isinstance(expected, dict):
+                for key in expected:
+                    if expected.get(key) != actual.get(key):
+                        print(f"     {key}: ожидалось {expected.get(key)!r}, получено {actual.get(key)!r}")
+
+    return failures
+
+
+async def measure(cases, iterations: int):
+    print(f"\n{'страница':<24}{'стр/с':>10}{'мс/стр':>10}{'пик памяти':>14}")
+
+    for name, case in cases.items():
+        # Прогрев: соединение keep-alive и кеши селекторов
+        await case.bench()
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await case.bench()
+        elapsed = time.perf_counter() - started
+
+        # Память меряем отдельным прогоном: tracemalloc сильно замедляет разбор
+        tracemalloc.start()
+        await case.bench()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{name:<24}{iterations / elapsed:>10.1f}{elapsed / iterations * 1000:>10.2f}{peak / 1024:>11.0f} КБ")
+
+
+async def run(base_url: str, iterations: int, update: bool) -> int:
+    settings.base_url = base_url
+    # Примитивы синхронизации лимитера привязаны к event loop
+    rate_limiter._buckets.clear()
+    cases = make_cases(base_url)
+
+    await http_client.connect()
+    try:
+        failures = await check(cases, base_url, update)
+        if iterations and not update:
+            await measure(cases, iterations)
+    finally:
+        await http_client.disconnect()
+
+    if failures:
+        print(f"\nрасхождений с эталоном: {len(failures)}")
+        return 1
+    return 0
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--iterations', type=int, default=50, help='разборов каждой страницы для замера (0 - без замера)')
+    arg_parser.add_argument('--update', action='store_true', help='перезаписать эталоны текущими результатами')
+    args = arg_parser.parse_args()
+
+    # Локальному серверу вежливость не нужна: измеряем только наш код
+    settings.rate_limit_rps = 1_000_000
+    settings.rate_limit_burst = 1_000_000
+    # Кеш ответов и условные запросы не должны влиять на замер
+    settings.response_cache_enabled = False
+    settings.conditional_requests = False
+
+    print(f"бэкенд: {settings.html_backend}")
+    with StubServer(ROUTES) as base_url:
+        return asyncio.run(run(base_url, args.iterations, args.update))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Проверка паритета HTML бэкендов.
+
+Разбирает сохраненные страницы товаров из benchmarks/fixtures каждым
+доступным бэкендом и сравнивает получившиеся объекты Product с эталонным
+бэкендом html.parser. Завершается с кодом 1 при любом расхождении.
+
+Запуск из корня репозитория:
+    python -m benchmarks.parity
+"""
+import importlib.util
+import sys
+import time
+from pathlib import Path
+
+from src.core.settings import settings
+from src.parsers.html_backend import HTML_BACKENDS
+from src.parsers.product_feature import ProductFeatureParser
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+REFERENCE_BACKEND = 'html.parser'
+PAGE_URL = 'https://kanc-mir.ru/catalog/fixture/'
+
+
+def available_backends():
+    modules = {'lxml': 'lxml', 'selectolax': 'selectolax'}
+    for backend in HTML_BACKENDS:
+        module = modules.get(backend)
+        if module and importlib.util.find_spec(module) is None:
+            print(f"пропуск {backend}: модуль {module} не установлен")
+            continue
+        yield backend
+
+
+def parse_with(backend: str, html: str) -> dict:
+    settings.html_backend = backend
+    product = ProductFeatureParser().parse_html(html, PAGE_URL)
+    return {key: value for key, value in product.to_document().items() if key != 'created_at'}
+
+
+def main() -> int:
+    backends = list(available_backends())
+    configured_backend = settings.html_backend
+    failures = 0
+
+    for path in sorted(FIXTURES_DIR.glob('product_*.html')):
+        html = path.read_text(encoding='utf-8')
+        expected = parse_with(REFERENCE_BACKEND, html)
+
+        for backend in backends:
+            started = time.perf_counter()
+            actual = parse_with(backend, html)
+            elapsed = (time.perf_counter() - started) * 1000
+
+            if actual == expected:
+                print(f"OK   {path.stem:<24} {backend:<12} {elapsed:7.2f} мс")
+                continue
+
+            failures += 1
+            print(f"FAIL {path.stem:<24} {backend:<12}")
+            for key in expected:
+                if actual.get(key) != expected[key]:
+                    print(f"     {key}: {expected[key]!r} != {actual.get(key)!r}")
+
+    settings.html_backend = configured_backend
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Локальный HTTP сервер, отдающий сохраненные страницы из benchmarks/fixtures.
+
+Запускается в отдельном процессе, чтобы не конкурировать за GIL с
+измеряемым event loop. Маршруты задаются словарем путь -> имя файла.
+"""
+import multiprocessing
+import socket
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def _serve(port: int, routes: Dict[str, str]):
+    pages = {path: (FIXTURES_DIR / name).read_bytes() for path, name in routes.items()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Заголовки и тело уходят отдельными пакетами: без TCP_NODELAY ответ ждет delayed ACK (~40 мс)
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = pages.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+class StubServer:
+    """Контекстный менеджер: поднимает сервер и возвращает его базовый URL"""
+
+    def __init__(self, routes: Dict[str, str]):
+        self.routes = routes
+        self.process = None
+        self.base_url = None
+
+    def __enter__(self) -> str:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        self.process = multiprocessing.Process(target=_serve, args=(port, self.routes), daemon=True)
+        self.process.start()
+        self._wait_ready(port)
+        self.base_url = f'http://127.0.0.1:{port}'
+        return self.base_url
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.join()
+
+    @staticmethod
+    def _wait_ready(port: int, timeout: float = 10.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                    return
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f'Локальный сервер не запустился на порту {port}')
@@ -0,0 +1,236 @@
+"""Потоковая выгрузка каталога товаров из MongoDB в JSON Lines или Parquet.
+
+Документы читаются курсором пакетами по export_batch_size и сразу пишутся
+в файл, поэтому память не зависит от размера каталога. В Parquet каждая
+строка - одна ценовая позиция предложения: цены развернуты в строки,
+атрибуты товара лежат колонкой map<string, string>. Для Parquet нужен
+pyarrow (pip install pyarrow), для JSON Lines - только зависимости парсера.
+
+Инкрементальная выгрузка: --since берет товары, измененные после момента
+времени (updated_at), --epoch - измененные начиная с эпохи обхода
+(crawl_epoch). Эпохи обычного обхода и запуски распределенного режима
+нумеруются отдельно, --since от режима не зависит.
+
+    python export.py --output products.jsonl
+    python export.py --format parquet --output products.parquet
+    python export.py --format parquet --output changed.parquet --since 2026-10-01T00:00:00
+    python export.py --output changed.jsonl --epoch 12
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+
+from src.core.log import setup_logging
+from src.core.settings import settings
+from src.repository.mongo_client import mongo_client
+
+logger = logging.getLogger(__name__)
+
+# Колонки Parquet, копируемые из товара, поставщика и предложения как есть
+PRODUCT_COLUMNS = ('article', 'title', 'description', 'brand', 'country_of_origin', 'warranty_months', 'category', 'created_at')
+SUPPLIER_COLUMNS = ('dealer_id', 'supplier_name')
+OFFER_COLUMNS = ('purchase_url', 'stock', 'delivery_time', 'package_info')
+PRICE_COLUMNS = ('qnt', 'discount', 'price')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--format', choices=('jsonl', 'parquet'), default='jsonl', help='формат файла')
+    parser.add_argument('--output', required=True, help='путь к файлу выгрузки (для jsonl "-" - stdout)')
+    parser.add_argument('--since', type=parse_since, help='только товары, измененные после момента (ISO 8601, без зоны - UTC)')
+    parser.add_argument('--epoch', type=int, help='только товары, измененные начиная с эпохи обхода')
+    parser.add_argument('--batch-size', type=int, default=settings.export_batch_size, help='документов в пакете курсора')
+    return parser.parse_args()
+
+
+def parse_since(value: str) -> datetime:
+    moment = datetime.fromisoformat(value)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def build_query(since: Optional[datetime], epoch: Optional[int]) -> dict:
+    query = {}
+    if since is not None:
+        query['updated_at'] = {'$gt': since}
+    if epoch is not None:
+        query['crawl_epoch'] = {'$gte': epoch}
+    return query
+
+
+async def iter_products(query: dict, batch_size: int) -> AsyncIterator[dict]:
+    collection = mongo_client.get_collection(settings.collection_name)
+    # Служебные поля хранения потребителям не нужны
+    cursor = collection.find(query, {'_id': 0, 'content_hash': 0}, batch_size=batch_size)
+    async for document in cursor:
+        yield document
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        # Motor возвращает даты без зоны, но хранятся они в UTC
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat()
+    return str(value)
+
+
+class ExportStats:
+    def __init__(self):
+        self.products = 0
+        self.rows = 0
+        self.last_updated_at: Optional[datetime] = None
+
+    def add(self, document: dict, rows: int = 1):
+        self.products += 1
+        self.rows += rows
+        updated_at = document.get('updated_at')
+        if updated_at is not None and (self.last_updated_at is None or updated_at > self.last_updated_at):
+            self.last_updated_at = updated_at
+
+
+async def export_jsonl(documents: AsyncIterator[dict], file) -> ExportStats:
+    stats = ExportStats()
+    async for document in documents:
+        file.write(json.dumps(document, ensure_ascii=False, default=_json_default))
+        file.write('\n')
+        stats.add(document)
+    return stats
+
+
+def parquet_schema(pa):
+    timestamp = pa.timestamp('us', tz='UTC')
+    return pa.schema(
+        [(name, pa.string()) for name in PRODUCT_COLUMNS]
+        + [
+            ('updated_at', timestamp),
+            ('last_seen', timestamp),
+            ('crawl_epoch', pa.int64()),
+            ('attributes', pa.map_(pa.string(), pa.string())),
+        ]
+        + [(name, pa.string()) for name in SUPPLIER_COLUMNS + OFFER_COLUMNS]
+        + [('qnt', pa.int64()), ('discount', pa.float64()), ('price', pa.float64())]
+    )
+
+
+def product_rows(document: dict):
+    """Строки Parquet одного товара: по строке на каждую цену каждого предложения.
+
+    Товар без предложений дает одну строку с пустыми колонками предложения,
+    чтобы не пропасть из выгрузки.
+    """
+    product = {name: document.get(name) for name in PRODUCT_COLUMNS}
+    product['updated_at'] = document.get('updated_at')
+    product['last_seen'] = document.get('last_seen')
+    product['crawl_epoch'] = document.get('crawl_epoch')
+    # Повторяющееся имя атрибута - последнее значение (ключи map уникальны)
+    product['attributes'] = list({
+        attribute['attr_name']: attribute['attr_value'] for attribute in document.get('attributes', [])
+    }.items())
+
+    emitted = False
+    for supplier in document.get('suppliers', []):
+        supplier_fields = {name: supplier.get(name) for name in SUPPLIER_COLUMNS}
+        for offer in supplier.get('supplier_offers', []):
+            offer_fields = {name: offer.get(name) for name in OFFER_COLUMNS}
+            for price in offer.get('price') or [{}]:
+                emitted = True
+                yield {**product, **supplier_fields, **offer_fields, **{name: price.get(name) for name in PRICE_COLUMNS}}
+
+    if not emitted:
+        yield product
+
+
+async def export_parquet(documents: AsyncIterator[dict], path: str, batch_size: int) -> ExportStats:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema(pa)
+    stats = ExportStats()
+    columns = {name: [] for name in schema.names}
+    buffered = 0
+
+    def write_group():
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+        for values in columns.values():
+            values.clear()
+
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        async for document in documents:
+            rows = 0
+            for row in product_rows(document):
+                for name, values in columns.items():
+                    values.append(row.get(name))
+                rows += 1
+            stats.add(document, rows)
+
+            # Группа строк пишется, как только набралось batch_size строк: память ограничена
+            buffered += rows
+            if buffered >= batch_size:
+                write_group()
+                buffered = 0
+
+        if buffered:
+            write_group()
+
+    return stats
+
+
+async def export(args) -> ExportStats:
+    query = build_query(args.since, args.epoch)
+    documents = iter_products(query, args.batch_size)
+
+    if args.format == 'jsonl' and args.output == '-':
+        return await export_jsonl(documents, sys.stdout)
+
+    # Потребитель не должен увидеть недописанный файл
+    temporary_path = f'{args.output}.tmp'
+    try:
+        if args.format == 'jsonl':
+            with open(temporary_path, 'w', encoding='utf-8') as file:
+                stats = await export_jsonl(documents, file)
+        else:
+            stats = await export_parquet(documents, temporary_path, args.batch_size)
+        os.replace(temporary_path, args.output)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    return stats
+
+
+async def main() -> int:
+    args = parse_args()
+    setup_logging()
+
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            logger.error("Для выгрузки в Parquet установите pyarrow: pip install pyarrow")
+            return 1
+    if args.format == 'parquet' and args.output == '-':
+        logger.error("Parquet нельзя писать в stdout, укажите файл")
+        return 1
+
+    started = time.perf_counter()
+    await mongo_client.connect()
+    try:
+        stats = await export(args)
+    finally:
+        await mongo_client.disconnect()
+
+    logger.info(
+        f"Выгружено товаров: {stats.products}, строк: {stats.rows} "
+        f"за {time.perf_counter() - started:.1f} с"
+    )
+    if stats.last_updated_at is not None:
+        # Граница для следующей инкрементальной выгрузки
+        logger.info(f"Следующая выгрузка: --since {_json_default(stats.last_updated_at)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,28 +1,81 @@
+import argparse
 import asyncio
 import logging
 
+from src.core.log import setup_logging
+from src.services.distributed import DistributedParserService
 from src.services.parser_service import ParserService
+from src.services.scheduler import SchedulerService
 
 
-def setup_logging():
-    """Настройка логирования"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler()
-        ]
+def parse_args():
+    parser = argparse.ArgumentParser(description='Парсер каталога КанцМир')
+    parser.add_argument(
+        '--prices-only',
+        action='store_true',
+        help='обновить только цены и наличие по страницам листинга',
     )
+    parser.add_argument(
+        '--replay',
+        action='store_true',
+        help='пересобрать товары из локального кеша ответов без обращения к сайту',
+    )
+    parser.add_argument(
+        '--coordinator',
+        action='store_true',
+        help='распределенный режим: поставить категории в общую очередь и ждать ее обработки',
+    )
+    parser.add_argument(
+        '--worker',
+        action='store_true',
+        help='распределенный режим: обрабатывать задачи общей очереди',
+    )
+    parser.add_argument(
+        '--sitemap',
+        action='store_true',
+        help='искать товары по sitemap сайта вместо обхода категорий',
+    )
+    parser.add_argument(
+        '--schedule',
+        action='store_true',
+        help='долгоживущий режим: перепроверять товары по частоте их изменений в пределах бюджета запросов',
+    )
+    return parser.parse_args()
 
 
 async def main():
     """Главная функция для запуска парсинга"""
+    args = parse_args()
     setup_logging()
 
+    if args.coordinator or args.worker:
+        # Несколько процессов и узлов делят работу через очередь в MongoDB
+        distributed_service = DistributedParserService()
+        if args.coordinator:
+            await distributed_service.coordinate('https://kanc-mir.ru/catalog/')
+        else:
+            await distributed_service.work()
+        return
+
+    if args.schedule:
+        # Часто меняющиеся товары проверяются чаще, новые - сразу после обнаружения
+        await SchedulerService().run_forever('https://kanc-mir.ru/catalog/')
+        return
+
     parser_service = ParserService()
 
-    # Запуск парсинга всех категорий
-    await parser_service.start_parsing('https://kanc-mir.ru/catalog/')
+    if args.replay:
+        # Разбор сохраненных страниц товаров: изменения парсера проверяются без обхода сайта
+        await parser_service.replay()
+    elif args.sitemap:
+        # Товары из sitemap сразу идут на загрузку, только измененные с прошлого запуска
+        await parser_service.crawl_sitemaps('https://kanc-mir.ru/')
+    elif args.prices_only:
+        # Быстрое обновление цен: страницы товаров загружаются только для новых URL
+        await parser_service.refresh_prices('https://kanc-mir.ru/catalog/')
+    else:
+        # Запуск парсинга всех категорий
+        await parser_service.start_parsing('https://kanc-mir.ru/catalog/')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: Labels, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    """Монотонный счетчик с метками"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[Labels, float] = defaultdict(float)
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        self._values[label_values] += amount
+
+    def render(self) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labels, key)} {value}' for key, value in self._values.items()]
+
+    def summary(self) -> dict:
+        return {'/'.join(key) or 'total': value for key, value in self._values.items()}
+
+
+class Gauge:
+    """Текущее значение; для размеров очередей значение читается функцией при выдаче"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._functions: Dict[Labels, Callable[[], float]] = {}
+
+    def track(self, *label_values: str, function: Callable[[], float]):
+        self._functions[label_values] = function
+
+    def render(self) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labels, key)} {function()}' for key, function in self._functions.items()]
+
+    def summary(self) -> dict:
+        return {'/'.join(key) or 'total': function() for key, function in self._functions.items()}
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: наблюдение - bisect и три сложения"""
+
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # Метки -> [счетчики корзин (последняя - +Inf), сумма, количество]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += bucket_count
+                bucket_label = f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, bucket_label)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {count}')
+        return lines
+
+    def summary(self) -> dict:
+        result = {}
+        for key, (counts, total, count) in self._series.items():
+            result['/'.join(key) or 'total'] = {
+                'count': count,
+                'mean': round(total / count, 4) if count else 0.0,
+                'p50': self._quantile(counts, count, 0.5),
+                'p95': self._quantile(counts, count, 0.95),
+            }
+        return result
+
+    def _quantile(self, counts: List[int], count: int, quantile: float) -> Optional[float]:
+        # Верхняя граница корзины, в которую попадает квантиль
+        target = quantile * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return bound
+        return None
+
+
+class CrawlMetrics:
+    """Метрики обхода: задержки, объемы, статусы, очереди и ошибки по стадиям.
+
+    Значения копятся в памяти процесса и отдаются в формате Prometheus на
+    /metrics (если задан metrics_port) и сводкой JSON в конце запуска.
+    Разбор HTML в процессах-воркерах возвращает свои замеры вместе с
+    результатом, поэтому они тоже попадают сюда.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+        self.http_request_seconds = Histogram(
+            'kancmir_http_request_seconds', 'Время HTTP запроса без ожидания rate limiter', ('kind',)
+        )
+        self.http_responses = Counter('kancmir_http_responses_total', 'Ответы по статусу', ('kind', 'status'))
+        self.http_bytes = Counter('kancmir_http_response_bytes_total', 'Загружено байт', ('kind',))
+        self.http_errors = Counter('kancmir_http_errors_total', 'Сетевые ошибки', ('kind', 'error'))
+
+        self.parse_seconds = Histogram(
+            'kancmir_parse_seconds', 'Время разбора страницы товара по этапам', ('step',)
+        )
+
+        self.mongo_write_seconds = Histogram('kancmir_mongo_write_seconds', 'Время bulk_write', ('collection',))
+        self.mongo_write_ops = Counter('kancmir_mongo_write_ops_total', 'Операций в пакетах записи', ('collection',))
+        self.mongo_write_errors = Counter('kancmir_mongo_write_errors_total', 'Ошибок записи', ('collection',))
+        self.products = Counter('kancmir_products_total', 'Обработанные товары по результату', ('result',))
+
+        self.stage_seconds = Histogram('kancmir_stage_seconds', 'Время обработки элемента стадией', ('stage',))
+        self.stage_items = Counter('kancmir_stage_items_total', 'Обработано элементов стадией', ('stage',))
+        self.stage_errors = Counter('kancmir_stage_errors_total', 'Ошибок на стадии', ('stage',))
+        self.queue_depth = Gauge('kancmir_queue_depth', 'Элементов в очереди стадии', ('stage',))
+
+        self._metrics = [
+            self.http_request_seconds, self.http_responses, self.http_bytes, self.http_errors,
+            self.parse_seconds,
+            self.mongo_write_seconds, self.mongo_write_ops, self.mongo_write_errors, self.products,
+            self.stage_seconds, self.stage_items, self.stage_errors, self.queue_depth,
+        ]
+
+    def observe_parse(self, timings: Dict[str, float]):
+        for step, seconds in timings.items():
+            self.parse_seconds.observe(seconds, step)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        products = sum(self.products.summary().values())
+        return {
+            'elapsed_seconds': round(elapsed, 1),
+            'products_per_second': round(products / elapsed, 2) if elapsed else 0.0,
+            **{metric.name: metric.summary() for metric in self._metrics},
+        }
+
+    def log_summary(self):
+        summary = self.summary()
+        logger.info(f"Метрики запуска: {json.dumps(summary, ensure_ascii=False)}")
+
+        if settings.metrics_summary_path:
+            try:
+                with open(settings.metrics_summary_path, 'w', encoding='utf-8') as file:
+                    json.dump(summary, file, ensure_ascii=False, indent=2)
+            except OSError as e:
+                logger.warning(f"Не удалось записать сводку метрик: {e}")
+
+    async def start(self):
+        """Начинает отсчет времени запуска и поднимает /metrics, если задан metrics_port"""
+        self.started_at = time.monotonic()
+        if not settings.metrics_port or self._server is not None:
+            return
+        self._server = await asyncio.start_server(self._handle, settings.metrics_host, settings.metrics_port)
+        logger.info(f"Метрики Prometheus: http://{settings.metrics_host}:{settings.metrics_port}/metrics")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            # Заголовки запроса не нужны, но их надо дочитать
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+
+            parts = request_line.split()
+            path = parts[1].decode('latin-1') if len(parts) > 1 else ''
+            if path == '/metrics':
+                status, content_type, body = '200 OK', 'text/plain; version=0.0.4; charset=utf-8', self.render()
+            elif path == '/metrics.json':
+                status, content_type, body = '200 OK', 'application/json', json.dumps(self.summary(), ensure_ascii=False)
+            else:
+                status, content_type, body = '404 Not Found', 'text/plain; charset=utf-8', 'not found\n'
+
+            data = body.encode('utf-8')
+            writer.write(
+                f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n'
+                f'Content-Length: {len(data)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + data
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+metrics = CrawlMetrics()
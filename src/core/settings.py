@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -9,6 +11,129 @@ class Settings(BaseSettings):
     mongo_url: str = Field(default="mongodb://localhost:27017/")
     db_name: str = Field(default="KancMir")
     collection_name: str = Field(default="products")
+    # Пул соединений и таймауты MongoDB (мс)
+    mongo_max_pool_size: int = Field(default=20)
+    mongo_min_pool_size: int = Field(default=0)
+    mongo_server_selection_timeout_ms: int = Field(default=10000)
+    mongo_connect_timeout_ms: int = Field(default=10000)
+    mongo_socket_timeout_ms: int = Field(default=60000)
+    # Подтверждение записи: w - число узлов или "majority", journal - ждать записи в журнал
+    mongo_write_concern: str = Field(default="1")
+    mongo_journal: bool = Field(default=False)
+    # Сжатие трафика с MongoDB по порядку предпочтения: zstd (пакет zstandard), snappy (python-snappy), zlib
+    mongo_compressors: List[str] = Field(default=[])
+    # Пакетная запись товаров
+    mongo_batch_size: int = Field(default=500)
+    mongo_flush_interval: float = Field(default=5.0)
+    # Пакетов в очереди писателя; когда она заполнена, сохранение ждет, а загрузка новых страниц приостанавливается
+    mongo_write_queue_size: int = Field(default=4)
+    validators_collection_name: str = Field(default="http_validators")
+    # История цен и наличия (строка на каждое изменение)
+    price_history_enabled: bool = Field(default=True)
+    price_history_collection_name: str = Field(default="price_history")
+
+    # Персистентная граница обхода для продолжения прерванного парсинга
+    frontier_enabled: bool = Field(default=True)
+    frontier_collection_name: str = Field(default="crawl_frontier")
+    crawl_state_collection_name: str = Field(default="crawl_state")
+    frontier_batch_size: int = Field(default=200)
+
+    # Распределенный режим: общая очередь задач в MongoDB для нескольких воркеров
+    work_queue_collection_name: str = Field(default="crawl_queue")
+    rate_budget_collection_name: str = Field(default="rate_budget")
+    work_lease_seconds: float = Field(default=120.0)
+    work_poll_interval: float = Field(default=1.0)
+    work_max_attempts: int = Field(default=5)
+    # Одновременно обрабатываемых задач в одном процессе-воркере
+    work_concurrency: int = Field(default=8)
+    # Общий для всех воркеров лимит запросов в секунду на хост (0 - только локальный лимит)
+    global_rate_limit_rps: int = Field(default=0)
+
+    # Поиск товаров по sitemap (--sitemap) вместо обхода дерева категорий
+    sitemap_product_url_pattern: str = Field(default=r"/catalog/[^/]+/[^/]+/[^/]+/$")
+    sitemap_workers: int = Field(default=1)
+    # Брать только товары с lastmod после начала прошлого успешного запуска
+    sitemap_incremental: bool = Field(default=True)
+    # Запас на расхождение часов сайта и lastmod, секунды
+    sitemap_lastmod_overlap: float = Field(default=3600)
+
+    # Режим расписания (--schedule): повторная загрузка товаров по частоте изменений
+    schedule_collection_name: str = Field(default="recrawl_schedule")
+    schedule_initial_interval: float = Field(default=24 * 3600)
+    schedule_min_interval: float = Field(default=3600)
+    schedule_max_interval: float = Field(default=14 * 24 * 3600)
+    # Как часто обходить листинги в поисках новых товаров, секунды
+    schedule_discovery_interval: float = Field(default=6 * 3600)
+    # Общий бюджет запросов к сайту в час (листинги и товары; 0 - только лимит на хост)
+    schedule_requests_per_hour: int = Field(default=3600)
+    # Подряд идущих временных ошибок, после которых URL убирается из расписания
+    schedule_max_failures: int = Field(default=5)
+
+    # HTTP клиент (общий пул соединений)
+    http_timeout: float = Field(default=30.0)
+    http_max_connections: int = Field(default=20)
+    http_max_keepalive_connections: int = Field(default=10)
+    http_keepalive_expiry: float = Field(default=30.0)
+    http2: bool = Field(default=False)
+    # Условные запросы (If-None-Match / If-Modified-Since) для страниц товаров
+    conditional_requests: bool = Field(default=True)
+    # Предельный размер тела ответа (после распаковки), больший ответ не загружается
+    max_response_bytes: int = Field(default=8 * 1024 ** 2)
+    # Страница товара дочитывается только до первого из маркеров: дальше похожие товары и подвал
+    product_page_cutoff_markers: List[str] = Field(
+        default=['<div class="similar_products_wrapp"', '<footer']
+    )
+
+    # Локальный кеш ответов на диске для повторного разбора без обращения к сайту (--replay)
+    response_cache_enabled: bool = Field(default=False)
+    response_cache_dir: str = Field(default=".cache/pages")
+    response_cache_ttl: float = Field(default=7 * 24 * 3600)
+    response_cache_max_bytes: int = Field(default=2 * 1024 ** 3)
+    response_cache_compress_level: int = Field(default=6)
+    # --replay пишет сюда товары, которые разобраны иначе, чем в каталоге; каталог не меняется
+    replay_collection_name: str = Field(default="products_replay")
+
+    # Конвейер парсинга: число воркеров на каждой стадии и размер очередей
+    category_workers: int = Field(default=2)
+    listing_workers: int = Field(default=2)
+    fetch_workers: int = Field(default=4)
+    parse_workers: int = Field(default=2)
+    save_workers: int = Field(default=1)
+    pipeline_queue_size: int = Field(default=100)
+    # Страницы листинга одной категории, загружаемые одновременно
+    listing_page_concurrency: int = Field(default=4)
+    # Защита от бесконечной пагинации при поиске страниц за видимым окном
+    listing_max_pages: int = Field(default=1000)
+
+    # Ограничение нагрузки на сайт (на каждый хост)
+    rate_limit_rps: float = Field(default=5.0)
+    rate_limit_burst: int = Field(default=5)
+    rate_limit_max_in_flight: int = Field(default=8)
+    rate_limit_min_rps: float = Field(default=0.5)
+    rate_limit_backoff_factor: float = Field(default=0.5)
+    rate_limit_recovery_step: float = Field(default=0.5)
+    rate_limit_recovery_successes: int = Field(default=20)
+    rate_limit_max_retry_after: float = Field(default=300.0)
+
+    # Повторы временных ошибок загрузки
+    retry_max_attempts: int = Field(default=4)
+    retry_backoff_base: float = Field(default=1.0)
+    retry_backoff_max: float = Field(default=30.0)
+    # Сколько раз заново ставить в очередь товары, не загруженные из-за временных ошибок
+    requeue_rounds: int = Field(default=2)
+
+    # Метрики: порт HTTP endpoint /metrics для Prometheus (0 - выключен) и файл сводки JSON
+    metrics_port: int = Field(default=0)
+    metrics_host: str = Field(default="0.0.0.0")
+    metrics_summary_path: str = Field(default="")
+
+    # Выгрузка каталога (export.py): документов в пакете курсора и строк в группе Parquet
+    export_batch_size: int = Field(default=1000)
+
+    # Бэкенд разбора HTML: html.parser, lxml или selectolax
+    html_backend: str = Field(default="html.parser")
+    # Число процессов для разбора HTML (0 - разбор в event loop)
+    parse_processes: int = Field(default=2)
 
     class Config:
         env_file = ".env"
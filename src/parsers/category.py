@@ -1,22 +1,41 @@
+import asyncio
+import logging
 import re
-from typing import List
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from urllib.parse import urljoin
 
-from bs4 import BeautifulSoup
-
 from src.core.settings import settings
+from src.parsers.html_backend import HtmlNode, parse_document
+from src.parsers.product_feature import extract_price, extract_stock
+from src.schemas.product import ListingItem
 from src.scrapers.scraper import PageScraper
 
+logger = logging.getLogger(__name__)
+
+PAGE_PATTERN = re.compile(r'PAGEN_1=(\d+)')
+
+
+@dataclass
+class ListingPage:
+    """Загруженная страница листинга; items=None, если страницу загрузить не удалось"""
+    url: str
+    items: Optional[Dict[str, ListingItem]]
+
 
 class CategoryPageParser:
 
     def __init__(self):
         self.scraper = PageScraper()
 
-    async def get_page_count(self, url: str) -> int:
-        html = await self.scraper.scrape_page(url)
-        pattern = r'PAGEN_1=(\d+)'
-        matches = re.findall(pattern, html)
+    @staticmethod
+    def page_url(url: str, page_number: int) -> str:
+        return f'{url}?PAGEN_1={page_number}'
+
+    @staticmethod
+    def parse_page_count(html: str) -> int:
+        """Максимальный номер страницы, видимый в пагинации"""
+        matches = PAGE_PATTERN.findall(html)
 
         if matches:
             # Возвращаем максимальный номер страницы
@@ -24,32 +43,141 @@ class CategoryPageParser:
         else:
             return 1
 
+    async def get_page_count(self, url: str) -> int:
+        html = await self.scraper.scrape_page(url, kind='listing')
+        return self.parse_page_count(html)
 
     async def create_page_links(self, url: str) -> List[str]:
         pages = []
         page_count = await self.get_page_count(url)
 
         for page_number in range(1, page_count + 1):
-            pages.append(f'{url}?PAGEN_1={page_number}')
+            pages.append(self.page_url(url, page_number))
 
         return pages
 
+    async def iter_listing_pages(self, url: str) -> AsyncIterator[ListingPage]:
+        """Загружает все страницы листинга категории и отдает их по мере готовности.
+
+        Первая страница загружается один раз: из нее берутся и число страниц,
+        и товары. Остальные страницы загружаются параллельно (не больше
+        listing_page_concurrency, общую нагрузку ограничивает rate limiter).
+        Пагинация может показывать только окно номеров, поэтому номер последней
+        страницы уточняется по каждой загруженной странице, а после нее
+        проверяется следующая, пока не попадется страница без новых товаров.
+        """
+        html = await self.scraper.scrape_page(url, kind='listing')
+        if html is None:
+            yield ListingPage(self.page_url(url, 1), None)
+            return
+
+        last_page = min(self.parse_page_count(html), settings.listing_max_pages)
+        first = ListingPage(self.page_url(url, 1), self._parse_listing(parse_document(html)))
+        seen = set(first.items)
+        yield first
+
+        # Проверка страницы за последней известной нужна только для многостраничных категорий
+        probe = last_page > 1
+        next_page = 2
+        tasks: Dict[asyncio.Task, int] = {}
+
+        try:
+            while True:
+                while len(tasks) < settings.listing_page_concurrency and next_page <= last_page:
+                    tasks[asyncio.create_task(self.fetch_listing_page(url, next_page))] = next_page
+                    next_page += 1
+
+                if not tasks:
+                    if not probe or next_page > settings.listing_max_pages:
+                        return
+                    # Все известные страницы загружены, проверяем следующую
+                    probe = False
+                    tasks[asyncio.create_task(self.fetch_listing_page(url, next_page))] = next_page
+                    next_page += 1
+
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    page_number = tasks.pop(task)
+                    page, page_count = task.result()
+
+                    if page_number > last_page:
+                        # Пустая страница или повтор последней (так отвечает Битрикс) - конец листинга
+                        if not page.items or seen.issuperset(page.items):
+                            continue
+                        last_page = page_number
+                        probe = True
+                    last_page = min(max(last_page, page_count), settings.listing_max_pages)
+
+                    if page.items:
+                        seen.update(page.items)
+                    yield page
+        finally:
+            # Потребитель прервал обход: незавершенные загрузки не нужны
+            for task in tasks:
+                task.cancel()
+
+    async def iter_product_links(self, url: str) -> AsyncIterator[str]:
+        """Отдает URL товаров категории, не дожидаясь загрузки всех страниц"""
+        seen = set()
+        async for page in self.iter_listing_pages(url):
+            for product_url in page.items or ():
+                if product_url not in seen:
+                    seen.add(product_url)
+                    yield product_url
+
+    async def fetch_listing_page(self, url: str, page_number: int) -> Tuple[ListingPage, int]:
+        """Загружает страницу листинга категории; возвращает ее и номер последней видимой страницы"""
+        page_url = self.page_url(url, page_number)
+        html = await self.scraper.scrape_page(page_url, kind='listing')
+        if html is None:
+            logger.warning(f"Не удалось загрузить страницу листинга: {page_url}")
+            return ListingPage(page_url, None), 0
+
+        return ListingPage(page_url, self._parse_listing(parse_document(html))), self.parse_page_count(html)
+
     async def get_product_links(self, url: str) -> List[str]:
-        html = await self.scraper.scrape_page(url)
-        soup = BeautifulSoup(html, 'html.parser')
-        product_links = set()  # Используем set для избежания дубликатов
+        html = await self.scraper.scrape_page(url, kind='listing')
+        return sorted(self._parse_listing(parse_document(html)))
+
+    async def get_listing_items(self, url: str) -> List[ListingItem]:
+        """Возвращает товары страницы листинга вместе с ценой и наличием из блока товара"""
+        html = await self.scraper.scrape_page(url, kind='listing')
+        items = self._parse_listing(parse_document(html))
+        return [items[product_url] for product_url in sorted(items)]
+
+    async def get_listing_page(self, url: str) -> ListingPage:
+        """Загружает одну страницу листинга по ее полному URL"""
+        html = await self.scraper.scrape_page(url, kind='listing')
+        if html is None:
+            return ListingPage(url, None)
+        return ListingPage(url, self._parse_listing(parse_document(html)))
+
+    def _parse_listing(self, doc: HtmlNode) -> Dict[str, ListingItem]:
+        product_links = {}  # Используем dict для избежания дубликатов
 
         # Находим все блоки товаров
-        item_blocks = soup.find_all('div', class_='item_block')
+        item_blocks = doc.css('div.item_block')
 
         for block in item_blocks:
             # Ищем ссылки в заголовках товаров
-            title_links = block.find_all('a', class_='dark_link')
+            title_links = block.css('a.dark_link')
             for link in title_links:
-                href = link.get('href')
+                href = link.attr('href')
                 if href and href.startswith('/catalog/') and href.count('/') >= 3:
                     full_url = urljoin(settings.base_url, href)
-                    product_links.add(full_url)
-
-        return sorted(list(product_links))
+                    if full_url not in product_links:
+                        product_links[full_url] = self._parse_listing_item(block, full_url)
+
+        return product_links
+
+    @staticmethod
+    def _parse_listing_item(block: HtmlNode, url: str) -> ListingItem:
+        # Цена и наличие в блоке листинга размечены так же, как на странице товара
+        price = extract_price(block)
+        stock = extract_stock(block)
+        return ListingItem(
+            url=url,
+            price=price or None,
+            stock=stock if stock != 'Нет данных' else None,
+        )
 
@@ -0,0 +1,136 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, Tag
+
+from src.core.settings import settings
+
+# Поддерживаемые бэкенды: два построителя BeautifulSoup и selectolax (lexbor)
+HTML_BACKENDS = ('html.parser', 'lxml', 'selectolax')
+
+
+# Простые селекторы вида tag, tag.class, tag#id, tag[attr="value"]
+SIMPLE_SELECTOR = re.compile(r'^([a-z][a-z0-9]*)(?:\.([\w-]+)|#([\w-]+)|\[([\w-]+)="([^"]*)"\])?$')
+
+
+@lru_cache(maxsize=256)
+def _simple_selector(selector: str) -> Optional[Tuple[str, Dict[str, str]]]:
+    """Переводит простой CSS селектор в аргументы find(); сложные остаются soupsieve"""
+    match = SIMPLE_SELECTOR.match(selector)
+    if not match:
+        return None
+
+    name, class_name, element_id, attr_name, attr_value = match.groups()
+    if class_name:
+        return name, {'class': class_name}
+    if element_id:
+        return name, {'id': element_id}
+    if attr_name:
+        return name, {attr_name: attr_value}
+    return name, {}
+
+
+class HtmlNode:
+    """Узел HTML дерева с общим интерфейсом для всех бэкендов.
+
+    Парсеры работают только через CSS селекторы и методы этого класса,
+    поэтому бэкенд можно переключить настройкой html_backend.
+    """
+
+    __slots__ = ()
+
+    def css(self, selector: str) -> List['HtmlNode']:
+        raise NotImplementedError
+
+    def css_first(self, selector: str) -> Optional['HtmlNode']:
+        raise NotImplementedError
+
+    def attr(self, name: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def text(self) -> str:
+        """Текст всех потомков, каждая строка обрезана (как get_text(strip=True))"""
+        raise NotImplementedError
+
+    def string(self) -> Optional[str]:
+        """Единственная строка внутри узла (как Tag.string в BeautifulSoup)"""
+        raise NotImplementedError
+
+
+class SoupNode(HtmlNode):
+    __slots__ = ('_tag',)
+
+    def __init__(self, tag: Tag):
+        self._tag = tag
+
+    # find()/find_all() заметно быстрее soupsieve, поэтому простые селекторы идут через них
+    def css(self, selector: str) -> List[HtmlNode]:
+        simple = _simple_selector(selector)
+        tags = self._tag.find_all(*simple) if simple else self._tag.select(selector)
+        return [SoupNode(tag) for tag in tags]
+
+    def css_first(self, selector: str) -> Optional[HtmlNode]:
+        simple = _simple_selector(selector)
+        tag = self._tag.find(*simple) if simple else self._tag.select_one(selector)
+        return SoupNode(tag) if tag is not None else None
+
+    def attr(self, name: str) -> Optional[str]:
+        value = self._tag.get(name)
+        # Многозначные атрибуты (class) BeautifulSoup возвращает списком
+        if isinstance(value, list):
+            return ' '.join(value)
+        return value
+
+    def text(self) -> str:
+        return self._tag.get_text(strip=True)
+
+    def string(self) -> Optional[str]:
+        value = self._tag.string
+        return str(value) if value is not None else None
+
+
+class LexborNode(HtmlNode):
+    __slots__ = ('_node',)
+
+    def __init__(self, node):
+        self._node = node
+
+    def css(self, selector: str) -> List[HtmlNode]:
+        return [LexborNode(node) for node in self._node.css(selector)]
+
+    def css_first(self, selector: str) -> Optional[HtmlNode]:
+        node = self._node.css_first(selector)
+        return LexborNode(node) if node is not None else None
+
+    def attr(self, name: str) -> Optional[str]:
+        return self._node.attributes.get(name)
+
+    def text(self) -> str:
+        return self._node.text(deep=True, separator='', strip=True)
+
+    def string(self) -> Optional[str]:
+        # Спускаемся, пока у узла ровно один потомок, как это делает Tag.string
+        node = self._node
+        while True:
+            children = list(node.iter(include_text=True))
+            if len(children) != 1:
+                return None
+            node = children[0]
+            if node.is_text_node:
+                return node.text_content
+
+
+def parse_document(html: str, backend: Optional[str] = None) -> HtmlNode:
+    """Разбирает HTML выбранным бэкендом и возвращает корневой узел"""
+    backend = backend or settings.html_backend
+
+    if backend == 'selectolax':
+        # Необязательная зависимость: импортируем только при выборе бэкенда
+        from selectolax.lexbor import LexborHTMLParser
+        return LexborNode(LexborHTMLParser(html).root)
+
+    if backend in ('html.parser', 'lxml'):
+        return SoupNode(BeautifulSoup(html, backend))
+
+    raise ValueError(f"Неизвестный HTML бэкенд: {backend}. Доступны: {', '.join(HTML_BACKENDS)}")
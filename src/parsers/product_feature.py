@@ -1,10 +1,81 @@
 import re
-from typing import List, Optional
-from bs4 import BeautifulSoup
+import time
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
 
+from src.core.metrics import metrics
 from src.core.settings import settings
-from src.scrapers.scraper import PageScraper
-from src.schemas.product import Product, Supplier, SupplierOffer, PriceInfo, Attribute
+from src.parsers.html_backend import HtmlNode, parse_document
+from src.scrapers.scraper import FetchStatus, PageScraper, TemporaryFetchError
+from src.schemas.record import OfferRecord, ProductRecord
+
+# Нормализованное название характеристики -> (исходное название, ячейка значения)
+PropsIndex = Dict[str, Tuple[str, HtmlNode]]
+
+STOCK_PATTERN = re.compile(r'В наличии|Нет в наличии|Под заказ')
+
+
+def _timed(step: str):
+    """Записывает время выполнения метода парсера в self.timings под именем step"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.timings[step] = time.perf_counter() - started
+        return wrapper
+    return decorator
+
+
+def extract_price(doc: HtmlNode) -> float:
+    """Извлекает цену товара со страницы товара или из блока товара в листинге"""
+    # Ищем цену в блоке цен с атрибутом data-value
+    price_block = doc.css_first('div.price')
+    if price_block:
+        # Сначала пробуем data-value атрибут
+        data_value = price_block.attr('data-value')
+        if data_value:
+            try:
+                return float(data_value)
+            except ValueError:
+                pass
+
+        # Если нет data-value, ищем в span с классом price_value
+        price_value = price_block.css_first('span.price_value')
+        if price_value:
+            price_text = price_value.text()
+            # Извлекаем число из строки
+            price_match = re.search(r'(\d+(?:\.\d+)?)', price_text)
+            if price_match:
+                return float(price_match.group(1))
+
+    # Ищем в meta теге
+    meta_price = doc.css_first('meta[itemprop="price"]')
+    if meta_price and meta_price.attr('content'):
+        try:
+            return float(meta_price.attr('content'))
+        except ValueError:
+            pass
+
+    return 0.0
+
+
+def extract_stock(doc: HtmlNode) -> str:
+    """Извлекает информацию о наличии со страницы товара или из блока товара в листинге"""
+    # Ищем в div с классом item-stock
+    stock_block = doc.css_first('div.item-stock')
+    if stock_block:
+        return stock_block.text()
+
+    # Альтернативный поиск: div, содержащий только строку о наличии
+    for block in doc.css('div'):
+        string = block.string()
+        if string and STOCK_PATTERN.search(string):
+            return block.text()
+
+    return 'Нет данных'
 
 
 class ProductFeatureParser:
@@ -12,30 +83,51 @@ class ProductFeatureParser:
 
     def __init__(self):
         self.scraper = PageScraper()
-
-    async def parse_product(self, url: str) -> Optional[Product]:
-        """Парсит страницу товара и возвращает объект Product"""
-        html = await self.scraper.scrape_page(url)
-        if not html:
+        # Время этапов последнего разбора, секунды (для метрик)
+        self.timings: Dict[str, float] = {}
+
+    async def parse_product(self, url: str) -> Optional[ProductRecord]:
+        """Парсит страницу товара и возвращает запись товара.
+
+        Возвращает None, если товар не найден. Если страница временно
+        недоступна, выбрасывает TemporaryFetchError, чтобы товар можно
+        было поставить в очередь повторно.
+        """
+        result = await self.scraper.fetch(url, kind='product')
+        if result.status == FetchStatus.TEMPORARY_ERROR:
+            raise TemporaryFetchError(result)
+        if not result.ok or not result.text:
             return None
 
-        soup = BeautifulSoup(html, 'html.parser')
+        product = self.parse_html(result.text, url)
+        metrics.observe_parse(self.timings)
+        return product
+
+    def parse_html(self, html: str, url: str) -> ProductRecord:
+        """Разбирает уже загруженный HTML страницы товара"""
+        started = time.perf_counter()
+        self.timings = {}
+        doc = parse_document(html)
+        self.timings['document'] = time.perf_counter() - started
+
+        # Таблицы характеристик разбираем один раз, дальше только поиск по индексу
+        props = self._build_props_index(doc)
 
         # Извлекаем основную информацию о товаре
-        title = self._extract_title(soup)
-        description = self._extract_description(soup)
-        article = self._extract_article(soup)
-        brand = self._extract_brand(soup)
-        country_of_origin = self._extract_country(soup)
-        category = self._extract_category(soup)
+        title = self._extract_title(doc)
+        description = self._extract_description(doc, title)
+        article = self._extract_article(doc, props)
+        brand = self._extract_brand(props)
+        country_of_origin = self._extract_country(props)
+        category = self._extract_category(doc, props)
 
         # Извлекаем атрибуты
-        attributes = self._extract_attributes(soup)
+        attributes = self._extract_attributes(props)
 
-        # Извлекаем информацию о поставщике
-        suppliers = self._extract_supplier_info(soup, url)
+        # Извлекаем предложение поставщика
+        offer = self._extract_offer(doc, props, url)
 
-        return Product(
+        product = ProductRecord(
             title=title,
             description=description,
             article=article,
@@ -43,140 +135,148 @@ class ProductFeatureParser:
             country_of_origin=country_of_origin,
             category=category,
             attributes=attributes,
-            suppliers=suppliers
+            offers=[offer],
         )
+        self.timings['total'] = time.perf_counter() - started
+        return product
+
+    @_timed('props')
+    def _build_props_index(self, doc: HtmlNode) -> PropsIndex:
+        """Строит индекс характеристик за один проход по всем таблицам props_list"""
+        # Таблицы характеристик: в основном блоке и в табе #props (может быть неактивным)
+        tables = []
+        for block in doc.css('div.char_block'):
+            table = block.css_first('table.props_list')
+            if table:
+                tables.append(table)
 
-    def _extract_title(self, soup: BeautifulSoup) -> str:
+        if not tables:
+            table = doc.css_first('table.props_list')
+            if table:
+                tables.append(table)
+
+        index: PropsIndex = {}
+        for table in tables:
+            for row in table.css('tr'):
+                name_cell = row.css_first('td.char_name')
+                value_cell = row.css_first('td.char_value')
+                if not (name_cell and value_cell):
+                    continue
+
+                # Название берем из span с itemprop="name", чтобы не захватить текст подсказок
+                name_span = name_cell.css_first('span[itemprop="name"]')
+                name = (name_span or name_cell).text()
+                if name:
+                    # Первое вхождение имеет приоритет, как и раньше
+                    index.setdefault(name.lower(), (name, value_cell))
+
+        return index
+
+    @_timed('title')
+    def _extract_title(self, doc: HtmlNode) -> str:
         """Извлекает название товара"""
         # Ищем в meta тегах
-        meta_title = soup.find('meta', {'itemprop': 'name'})
-        if meta_title and meta_title.get('content'):
-            return meta_title.get('content')
+        meta_title = doc.css_first('meta[itemprop="name"]')
+        if meta_title and meta_title.attr('content'):
+            return meta_title.attr('content')
 
         # Альтернативный поиск в h1
-        h1_tag = soup.find('h1')
+        h1_tag = doc.css_first('h1')
         if h1_tag:
-            return h1_tag.get_text(strip=True)
+            return h1_tag.text()
 
         # Поиск в title
-        title_tag = soup.find('title')
+        title_tag = doc.css_first('title')
         if title_tag:
-            return title_tag.get_text(strip=True)
+            return title_tag.text()
 
         return 'Нет данных'
 
-    def _extract_description(self, soup: BeautifulSoup) -> str:
+    @_timed('description')
+    def _extract_description(self, doc: HtmlNode, title: str) -> str:
         """Извлекает описание товара"""
         # Ищем в табе описания (может быть активным или неактивным)
-        descr_tab = soup.find('div', {'id': 'descr'})
+        descr_tab = doc.css_first('div#descr')
         if descr_tab:
             # Ищем в descr-outer-wrapper
-            descr_wrapper = descr_tab.find('div', class_='descr-outer-wrapper')
+            descr_wrapper = descr_tab.css_first('div.descr-outer-wrapper')
             if descr_wrapper:
-                text = descr_wrapper.get_text(strip=True)
+                text = descr_wrapper.text()
                 if text:
                     return text
 
             # Ищем любой текст в табе описания
-            text = descr_tab.get_text(strip=True)
+            text = descr_tab.text()
             # Убираем заголовок "Описание"
             text = text.replace('Описание', '').strip()
             if text:
                 return text
 
         # Ищем в основном блоке описания (если есть)
-        desc_block = soup.find('div', class_='detail_text')
+        desc_block = doc.css_first('div.detail_text')
         if desc_block:
-            text = desc_block.get_text(strip=True)
+            text = desc_block.text()
             if text:
                 return text
 
         # Альтернативный поиск в meta описании
-        meta_desc = soup.find('meta', {'itemprop': 'description'})
-        if meta_desc and meta_desc.get('content'):
-            content = meta_desc.get('content')
+        meta_desc = doc.css_first('meta[itemprop="description"]')
+        if meta_desc and meta_desc.attr('content'):
+            content = meta_desc.attr('content')
             # Проверяем, что описание не дублирует название
-            title = self._extract_title(soup)
             if content and content != title:
                 return content
 
         return 'Нет данных'
 
-    def _extract_article(self, soup: BeautifulSoup) -> str:
+    @_timed('article')
+    def _extract_article(self, doc: HtmlNode, props: PropsIndex) -> str:
         """Извлекает артикул товара"""
         # Сначала ищем в таблице характеристик (приоритет)
-        props_table = soup.find('table', class_='props_list')
-        if props_table:
-            rows = props_table.find_all('tr')
-            for row in rows:
-                name_cell = row.find('td', class_='char_name')
-                value_cell = row.find('td', class_='char_value')
-                if name_cell and value_cell:
-                    name = name_cell.get_text(strip=True)
-                    if name == 'Артикул':
-                        article = value_cell.get_text(strip=True)
-                        if article:
-                            return article
+        if 'артикул' in props:
+            article = props['артикул'][1].text()
+            if article:
+                return article
 
         # Если не найден в таблице, ищем в meta теге sku
-        meta_sku = soup.find('meta', {'itemprop': 'sku'})
-        if meta_sku and meta_sku.get('content'):
-            return meta_sku.get('content')
+        meta_sku = doc.css_first('meta[itemprop="sku"]')
+        if meta_sku and meta_sku.attr('content'):
+            return meta_sku.attr('content')
 
         # Ищем ШтрихКод как альтернативу
-        if props_table:
-            rows = props_table.find_all('tr')
-            for row in rows:
-                name_cell = row.find('td', class_='char_name')
-                value_cell = row.find('td', class_='char_value')
-                if name_cell and value_cell:
-                    name = name_cell.get_text(strip=True)
-                    if name == 'ШтрихКод':
-                        return value_cell.get_text(strip=True)
+        if 'штрихкод' in props:
+            return props['штрихкод'][1].text()
 
         return 'Нет данных'
 
-    def _extract_brand(self, soup: BeautifulSoup) -> str:
+    @_timed('brand')
+    def _extract_brand(self, props: PropsIndex) -> str:
         """Извлекает бренд товара"""
-        # Ищем в таблице характеристик
-        props_table = soup.find('table', class_='props_list')
-        if props_table:
-            rows = props_table.find_all('tr')
-            for row in rows:
-                name_cell = row.find('td', class_='char_name')
-                value_cell = row.find('td', class_='char_value')
-                if name_cell and value_cell:
-                    name = name_cell.get_text(strip=True)
-                    if name == 'Бренд':
-                        # Извлекаем текст, игнорируя ссылки
-                        brand_link = value_cell.find('a')
-                        if brand_link:
-                            return brand_link.get_text(strip=True)
-                        return value_cell.get_text(strip=True)
+        if 'бренд' in props:
+            value_cell = props['бренд'][1]
+            # Извлекаем текст, игнорируя ссылки
+            brand_link = value_cell.css_first('a')
+            if brand_link:
+                return brand_link.text()
+            return value_cell.text()
 
         return 'Нет данных'
 
-    def _extract_country(self, soup: BeautifulSoup) -> str:
+    @_timed('country')
+    def _extract_country(self, props: PropsIndex) -> str:
         """Извлекает страну производителя"""
-        props_table = soup.find('table', class_='props_list')
-        if props_table:
-            rows = props_table.find_all('tr')
-            for row in rows:
-                name_cell = row.find('td', class_='char_name')
-                value_cell = row.find('td', class_='char_value')
-                if name_cell and value_cell:
-                    name = name_cell.get_text(strip=True)
-                    if name == 'Производитель':
-                        return value_cell.get_text(strip=True)
+        if 'производитель' in props:
+            return props['производитель'][1].text()
 
         return 'Нет данных'
 
-    def _extract_category(self, soup: BeautifulSoup) -> str:
+    @_timed('category')
+    def _extract_category(self, doc: HtmlNode, props: PropsIndex) -> str:
         """Извлекает последнюю категорию товара из цепочки"""
         # Ищем в meta теге
-        meta_category = soup.find('meta', {'itemprop': 'category'})
-        if meta_category and meta_category.get('content'):
-            category_chain = meta_category.get('content')
+        meta_category = doc.css_first('meta[itemprop="category"]')
+        if meta_category and meta_category.attr('content'):
+            category_chain = meta_category.attr('content')
             # Разделяем по слэшу и берем последнее значение
             parts = category_chain.split('/')
             last_category = parts[-1].strip()
@@ -184,33 +284,26 @@ class ProductFeatureParser:
                 return last_category
 
         # Ищем в таблице характеристик
-        props_table = soup.find('table', class_='props_list')
-        if props_table:
-            rows = props_table.find_all('tr')
-            for row in rows:
-                name_cell = row.find('td', class_='char_name')
-                value_cell = row.find('td', class_='char_value')
-                if name_cell and value_cell:
-                    name = name_cell.get_text(strip=True)
-                    if name == 'Категория товара':
-                        category_link = value_cell.find('a')
-                        if category_link:
-                            category_text = category_link.get_text(strip=True)
-                        else:
-                            category_text = value_cell.get_text(strip=True)
-
-                        # Разделяем по слэшу и берем последнее значение
-                        parts = category_text.split('/')
-                        last_category = parts[-1].strip()
-                        if last_category:
-                            return last_category
+        if 'категория товара' in props:
+            value_cell = props['категория товара'][1]
+            category_link = value_cell.css_first('a')
+            if category_link:
+                category_text = category_link.text()
+            else:
+                category_text = value_cell.text()
+
+            # Разделяем по слэшу и берем последнее значение
+            parts = category_text.split('/')
+            last_category = parts[-1].strip()
+            if last_category:
+                return last_category
 
         return 'Нет данных'
 
-    def _extract_attributes(self, soup: BeautifulSoup) -> List[Attribute]:
+    @_timed('attributes')
+    def _extract_attributes(self, props: PropsIndex) -> List[Tuple[str, str]]:
         """Извлекает атрибуты товара без дублирования"""
         attributes = []
-        seen_attributes = set()
 
         # Характеристики, которые уже извлекаются как отдельные поля
         excluded_attributes = {
@@ -218,170 +311,72 @@ class ProductFeatureParser:
             'код', 'название', 'описание', 'цена', 'стоимость'
         }
 
-        # Ищем таблицы характеристик: в основном блоке и в табе #props
-        tables_to_check = []
+        # Индекс уже содержит каждую характеристику один раз в порядке таблиц
+        for name_lower, (name, value_cell) in props.items():
+            # Пропускаем исключенные характеристики
+            if name_lower in excluded_attributes:
+                continue
 
-        # 1. Основная таблица в верхней части товара
-        main_char_blocks = soup.find_all('div', class_='char_block')
-        for block in main_char_blocks:
-            table = block.find('table', class_='props_list')
-            if table:
-                tables_to_check.append(table)
-
-        # 2. Таблица в табе #props (может быть неактивным)
-        props_tab = soup.find('div', {'id': 'props'})
-        if props_tab:
-            char_block = props_tab.find('div', class_='char_block')
-            if char_block:
-                tab_table = char_block.find('table', class_='props_list')
-                if tab_table and tab_table not in tables_to_check:
-                    tables_to_check.append(tab_table)
-
-        # Обрабатываем все найденные таблицы
-        for props_table in tables_to_check:
-            rows = props_table.find_all('tr')
-            for row in rows:
-                name_cell = row.find('td', class_='char_name')
-                value_cell = row.find('td', class_='char_value')
-
-                if name_cell and value_cell:
-                    # Извлекаем название из span с itemprop="name"
-                    name_span = name_cell.find('span', {'itemprop': 'name'})
-                    if name_span:
-                        name = name_span.get_text(strip=True)
-                    else:
-                        name = name_cell.get_text(strip=True)
-
-                    # Извлекаем значение из span с itemprop="value" или любого содержимого
-                    value_span = value_cell.find('span', {'itemprop': 'value'})
-                    if value_span:
-                        # Проверяем есть ли ссылка внутри
-                        value_link = value_span.find('a')
-                        if value_link:
-                            value = value_link.get_text(strip=True)
-                        else:
-                            value = value_span.get_text(strip=True)
-                    else:
-                        # Если нет span с itemprop, берем весь текст ячейки
-                        value_link = value_cell.find('a')
-                        if value_link:
-                            value = value_link.get_text(strip=True)
-                        else:
-                            value = value_cell.get_text(strip=True)
-
-                    if name and value:
-                        name_lower = name.lower().strip()
-
-                        # Пропускаем исключенные характеристики
-                        if name_lower in excluded_attributes:
-                            continue
-
-                        # Пропускаем дубликаты
-                        if name_lower in seen_attributes:
-                            continue
-
-                        attributes.append(Attribute(attr_name=name, attr_value=value))
-                        seen_attributes.add(name_lower)
+            # Извлекаем значение из span с itemprop="value" или любого содержимого
+            value_span = value_cell.css_first('span[itemprop="value"]')
+            container = value_span or value_cell
 
-        return attributes
+            # Проверяем есть ли ссылка внутри
+            value_link = container.css_first('a')
+            if value_link:
+                value = value_link.text()
+            else:
+                value = container.text()
 
-    def _extract_price(self, soup: BeautifulSoup) -> float:
-        """Извлекает цену товара"""
-        # Ищем цену в блоке цен с атрибутом data-value
-        price_block = soup.find('div', class_='price')
-        if price_block:
-            # Сначала пробуем data-value атрибут
-            data_value = price_block.get('data-value')
-            if data_value:
-                try:
-                    return float(data_value)
-                except ValueError:
-                    pass
-
-            # Если нет data-value, ищем в span с классом price_value
-            price_value = price_block.find('span', class_='price_value')
-            if price_value:
-                price_text = price_value.get_text(strip=True)
-                # Извлекаем число из строки
-                price_match = re.search(r'(\d+(?:\.\d+)?)', price_text)
-                if price_match:
-                    return float(price_match.group(1))
-
-        # Ищем в meta теге
-        meta_price = soup.find('meta', {'itemprop': 'price'})
-        if meta_price and meta_price.get('content'):
-            try:
-                return float(meta_price.get('content'))
-            except ValueError:
-                pass
+            if value:
+                attributes.append((name, value))
 
-        return 0.0
-
-    def _extract_stock(self, soup: BeautifulSoup) -> str:
-        """Извлекает информацию о наличии"""
-        # Ищем в div с классом item-stock
-        stock_block = soup.find('div', class_='item-stock')
-        if stock_block:
-            return stock_block.get_text(strip=True)
-
-        # Альтернативный поиск
-        stock_blocks = soup.find_all('div', string=re.compile(r'В наличии|Нет в наличии|Под заказ'))
-        if stock_blocks:
-            return stock_blocks[0].get_text(strip=True)
-
-        return 'Нет данных'
+        return attributes
 
-    def _extract_delivery_info(self, soup: BeautifulSoup) -> str:
+    def _extract_delivery_info(self, doc: HtmlNode) -> str:
         """Извлекает информацию о доставке"""
-        delivery_block = soup.find('div', class_='my_delivery')
+        delivery_block = doc.css_first('div.my_delivery')
         if delivery_block:
-            return delivery_block.get_text(strip=True)
+            return delivery_block.text()
 
         return 'Нет данных'
 
-    def _extract_package_info(self, soup: BeautifulSoup) -> str:
+    def _extract_package_info(self, props: PropsIndex) -> str:
         """Извлекает информацию об упаковке"""
         # Ищем количество в упаковке в характеристиках
-        props_table = soup.find('table', class_='props_list')
-        if props_table:
-            rows = props_table.find_all('tr')
-            for row in rows:
-                name_cell = row.find('td', class_='char_name')
-                value_cell = row.find('td', class_='char_value')
-                if name_cell and value_cell:
-                    name = name_cell.get_text(strip=True)
-                    if name == 'Кол-во в упаковке':
-                        count = value_cell.get_text(strip=True)
-                        return f"{count} шт в упаковке"
+        if 'кол-во в упаковке' in props:
+            count = props['кол-во в упаковке'][1].text()
+            return f"{count} шт в упаковке"
 
         return 'Нет данных'
 
-    def _extract_supplier_info(self, soup: BeautifulSoup, page_url: str) -> List[Supplier]:
-        """Извлекает информацию о поставщике"""
-        # Извлекаем данные
-        price = self._extract_price(soup)
-        stock = self._extract_stock(soup)
-        delivery_info = self._extract_delivery_info(soup)
-        package_info = self._extract_package_info(soup)
-
-        # Создаем объект цены
-        price_info = PriceInfo(qnt=1, discount=0, price=price)
-
-        # Создаем предложение поставщика
-        supplier_offer = SupplierOffer(
-            price=[price_info],
-            stock=stock,
-            delivery_time=delivery_info,
-            package_info=package_info,
-            purchase_url=page_url
+    @_timed('supplier')
+    def _extract_offer(self, doc: HtmlNode, props: PropsIndex, page_url: str) -> OfferRecord:
+        """Извлекает предложение поставщика; данные самого поставщика общие (SUPPLIER)"""
+        return OfferRecord(
+            price=extract_price(doc),
+            stock=extract_stock(doc),
+            delivery_time=self._extract_delivery_info(doc),
+            package_info=self._extract_package_info(props),
+            purchase_url=page_url,
         )
 
-        # Создаем поставщика
-        supplier = Supplier(
-            supplier_name='КанцМир',
-            supplier_tel='+7 (499) 199-59-60',
-            supplier_description='Интернет-магазин канцелярских товаров',
-            supplier_offers=[supplier_offer]
-        )
 
-        return [supplier]
\ No newline at end of file
+# Парсер процесса-воркера, создается один раз на процесс
+_worker_parser: Optional[ProductFeatureParser] = None
+
+
+def parse_product_page(content: bytes, encoding: str, url: str) -> Tuple[ProductRecord, Dict[str, float]]:
+    """Разбирает страницу товара и возвращает запись товара и время этапов разбора.
+
+    Функция уровня модуля, чтобы ее можно было выполнять в ProcessPoolExecutor:
+    декодирование и разбор HTML не блокируют event loop. Метрики процесса-воркера
+    не видны главному процессу, поэтому время этапов возвращается вместе с результатом.
+    """
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = ProductFeatureParser()
+
+    html = content.decode(encoding, errors='replace')
+    product = _worker_parser.parse_html(html, url)
+    return product, _worker_parser.timings
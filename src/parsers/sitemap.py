@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import re
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Pattern
+from urllib.parse import urljoin
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+import httpx
+
+from src.core.metrics import metrics
+from src.scrapers.http_client import http_client
+from src.scrapers.rate_limiter import parse_retry_after, rate_limiter
+from src.scrapers.retry import RetryPolicy
+from src.scrapers.scraper import PageScraper
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_LINE = re.compile(r'^\s*sitemap\s*:\s*(\S+)', re.IGNORECASE | re.MULTILINE)
+GZIP_MAGIC = b'\x1f\x8b'
+# Индекс sitemap может ссылаться на другие индексы; глубже не идем
+MAX_SITEMAP_DEPTH = 3
+
+
+@dataclass(slots=True)
+class SitemapEntry:
+    """Запись sitemap: <url> страницы или <sitemap> вложенного файла индекса"""
+    loc: str
+    lastmod: Optional[datetime]
+    is_sitemap: bool
+
+
+class SitemapFetchError(Exception):
+    """Ответ на запрос sitemap с кодом, отличным от 200"""
+
+    def __init__(self, status_code: int, retryable: bool, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status_code}")
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """Разбирает <lastmod> в формате W3C Datetime (дата или дата со временем)"""
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+class SitemapParser:
+    """Поиск страниц товаров по robots.txt и sitemap вместо обхода дерева категорий.
+
+    Файлы sitemap читаются потоком: ответ (в том числе .xml.gz) распаковывается
+    по мере получения и разбирается XMLPullParser, обработанные элементы сразу
+    удаляются из дерева. Фильтры по lastmod и шаблону URL применяются при
+    разборе: в памяти остается только список отобранных записей.
+    Записи передаются дальше после того, как файл прочитан целиком и
+    соединение и место в rate limiter освобождены: загрузка товаров с того же
+    хоста не ждет, пока конвейер разберет весь sitemap.
+    """
+
+    def __init__(self):
+        self.scraper = PageScraper()
+        self.retry_policy = RetryPolicy()
+        # Файлы, которые не удалось прочитать полностью в этом запуске
+        self.failed: List[str] = []
+
+    async def get_sitemap_urls(self, base_url: str) -> List[str]:
+        """Адреса sitemap из robots.txt; если их там нет - стандартный /sitemap.xml"""
+        robots = await self.scraper.scrape_page(urljoin(base_url, '/robots.txt'), kind='robots')
+        urls = list(dict.fromkeys(SITEMAP_LINE.findall(robots or '')))
+        if not urls:
+            urls = [urljoin(base_url, '/sitemap.xml')]
+        logger.info(f"Найдено sitemap в robots.txt: {len(urls)}")
+        return urls
+
+    async def iter_page_urls(
+        self,
+        sitemap_url: str,
+        since: Optional[datetime] = None,
+        pattern: Optional[Pattern] = None,
+        depth: int = 0,
+    ) -> AsyncIterator[str]:
+        """URL страниц из sitemap и вложенных индексов.
+
+        Записи с lastmod раньше since пропускаются, в том числе целые вложенные
+        файлы индекса. Записи без lastmod берутся всегда.
+        """
+        children = []
+        async for entry in self.iter_entries(sitemap_url, since, pattern):
+            if entry.is_sitemap:
+                # Вложенные файлы читаем после того, как переданы страницы текущего
+                children.append(entry.loc)
+            else:
+                yield entry.loc
+
+        if children and depth >= MAX_SITEMAP_DEPTH:
+            logger.warning(f"Слишком глубокая вложенность sitemap, пропущено: {sitemap_url}")
+            return
+        for child_url in children:
+            async for url in self.iter_page_urls(child_url, since, pattern, depth + 1):
+                yield url
+
+    async def iter_entries(
+        self,
+        sitemap_url: str,
+        since: Optional[datetime] = None,
+        pattern: Optional[Pattern] = None,
+    ) -> AsyncIterator[SitemapEntry]:
+        """Отобранные записи одного файла sitemap; файл читается целиком, с повторами"""
+        policy = self.retry_policy
+        error = None
+        entries = None
+
+        for attempt in range(1, policy.max_attempts + 1):
+            retry_after = None
+            try:
+                entries = await self._read_entries(sitemap_url, since, pattern)
+                break
+            except SitemapFetchError as e:
+                error, retry_after = str(e), e.retry_after
+                if not e.retryable:
+                    break
+            except (httpx.HTTPError, ParseError, zlib.error) as e:
+                error = repr(e)
+
+            if attempt < policy.max_attempts:
+                delay = policy.delay(attempt, retry_after)
+                logger.info(f"Повтор {attempt}/{policy.max_attempts - 1} для {sitemap_url} через {delay:.1f} с ({error})")
+                await asyncio.sleep(delay)
+
+        if entries is None:
+            logger.warning(f"Sitemap не прочитан: {sitemap_url} ({error})")
+            self.failed.append(sitemap_url)
+            return
+
+        # Соединение и место в rate limiter уже освобождены: потребитель может ждать сколько угодно
+        for entry in entries:
+            yield entry
+
+    async def _read_entries(
+        self,
+        sitemap_url: str,
+        since: Optional[datetime],
+        pattern: Optional[Pattern],
+    ) -> List[SitemapEntry]:
+        client = http_client.get_client()
+        async with rate_limiter.acquire(sitemap_url):
+            started = time.perf_counter()
+            async with client.stream('GET', sitemap_url) as response:
+                metrics.http_request_seconds.observe(time.perf_counter() - started, 'sitemap')
+                rate_limiter.record(sitemap_url, response.status_code, response.headers.get('Retry-After'))
+                metrics.http_responses.inc('sitemap', str(response.status_code))
+
+                if response.status_code != 200:
+                    raise SitemapFetchError(
+                        response.status_code,
+                        self.retry_policy.should_retry_status(response.status_code),
+                        parse_retry_after(response.headers.get('Retry-After')),
+                    )
+
+                return [entry async for entry in self._parse_stream(response, since, pattern)]
+
+    @staticmethod
+    def _selected(loc: str, lastmod: Optional[datetime], is_sitemap: bool,
+                  since: Optional[datetime], pattern: Optional[Pattern]) -> bool:
+        """Записи с lastmod раньше since не нужны; шаблон проверяется только у страниц"""
+        if since is not None and lastmod is not None and lastmod < since:
+            return False
+        return is_sitemap or pattern is None or pattern.search(loc) is not None
+
+    @classmethod
+    async def _parse_stream(
+        cls,
+        response: httpx.Response,
+        since: Optional[datetime] = None,
+        pattern: Optional[Pattern] = None,
+    ) -> AsyncIterator[SitemapEntry]:
+        parser = XMLPullParser(events=('start', 'end'))
+        decompressor = None
+        first_chunk = True
+        root = None
+        loc = lastmod = None
+
+        async for chunk in response.aiter_bytes():
+            metrics.http_bytes.inc('sitemap', amount=len(chunk))
+            # .xml.gz отдается как файл, без Content-Encoding: распаковываем сами
+            if first_chunk:
+                first_chunk = False
+                if chunk.startswith(GZIP_MAGIC):
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            parser.feed(decompressor.decompress(chunk) if decompressor else chunk)
+
+            for event, element in parser.read_events():
+                if event == 'start':
+                    if root is None:
+                        root = element
+                    continue
+
+                tag = element.tag.rpartition('}')[2]
+                if tag == 'loc':
+                    loc = (element.text or '').strip()
+                elif tag == 'lastmod':
+                    lastmod = parse_lastmod(element.text)
+                elif tag in ('url', 'sitemap'):
+                    is_sitemap = tag == 'sitemap'
+                    if loc and cls._selected(loc, lastmod, is_sitemap, since, pattern):
+                        yield SitemapEntry(loc, lastmod, is_sitemap)
+                    loc = lastmod = None
+                    # Обработанные записи не копятся в дереве
+                    root.clear()
+
+        parser.close()
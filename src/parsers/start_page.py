@@ -1,8 +1,7 @@
 from typing import List
 
-from bs4 import BeautifulSoup
-
 from src.core.settings import settings
+from src.parsers.html_backend import parse_document
 from src.scrapers.scraper import PageScraper
 
 class StartPageParser:
@@ -11,17 +10,17 @@ class StartPageParser:
         self.scraper = PageScraper()
 
     async def get_categories(self, url: str) -> List[str]:
-        html = await self.scraper.scrape_page(url)
-        soup = BeautifulSoup(html, 'html.parser')
+        html = await self.scraper.scrape_page(url, kind='start')
+        doc = parse_document(html)
 
-        name_items = soup.find_all('li', class_='name')
+        name_items = doc.css('li.name')
 
         categories = []
         for item in name_items:
-            link = item.find('a', class_='dark_link')
+            link = item.css_first('a.dark_link')
             if link:
                 categories.append(
-                    settings.base_url + link.get('href'),
+                    settings.base_url + link.attr('href'),
                 )
 
         return categories
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from typing import Dict, Hashable, Optional
+
+from pymongo import UpdateOne
+
+from src.core.settings import settings
+from src.repository.mongo_client import mongo_client
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedWriter:
+    """Пакетная запись UpdateOne в коллекцию MongoDB.
+
+    Последняя операция по ключу заменяет предыдущую в пределах пакета.
+    Пакет пишется при наполнении до batch_size, раз в mongo_flush_interval
+    (после start) и при close.
+    """
+
+    def __init__(self, collection_name: str, batch_size: int, description: str):
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        # Для логов: что именно не удалось сохранить
+        self.description = description
+        self._buffer: Dict[Hashable, UpdateOne] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def collection(self):
+        return mongo_client.get_collection(self.collection_name)
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def start(self):
+        """Запускает периодический сброс буфера"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+    async def put(self, key: Hashable, operation: UpdateOne):
+        self._buffer[key] = operation
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+
+            batch = list(self._buffer.values())
+            self._buffer = {}
+            try:
+                await self.collection.bulk_write(batch, ordered=False)
+            except Exception as e:
+                logger.error(f"Ошибка сохранения {self.description} ({len(batch)}): {e}")
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(settings.mongo_flush_interval)
+            await self.flush()
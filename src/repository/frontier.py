@@ -0,0 +1,121 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Set
+
+from pymongo import UpdateOne
+
+from src.core.settings import settings
+from src.repository.buffered_writer import BufferedWriter
+from src.repository.mongo_client import mongo_client
+
+logger = logging.getLogger(__name__)
+
+STATE_ID = 'frontier'
+
+
+class FrontierStatus:
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+class Frontier:
+    """Персистентная граница обхода: URL, стадия, статус, попытки, последняя ошибка.
+
+    Каждый запуск обхода получает номер эпохи. Если предыдущий запуск не
+    завершился (падение, OOM, перезапуск контейнера), эпоха продолжается:
+    завершенные в ней URL пропускаются, незавершенные ставятся в очередь
+    заново. Изменения пишутся в MongoDB пакетами.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.epoch = 0
+        self._finished: Set[str] = set()
+        self._writer = BufferedWriter(settings.frontier_collection_name, settings.frontier_batch_size, 'границы обхода')
+
+    @property
+    def collection(self):
+        return mongo_client.get_collection(settings.frontier_collection_name)
+
+    @property
+    def state_collection(self):
+        return mongo_client.get_collection(settings.crawl_state_collection_name)
+
+    async def begin_run(self) -> Dict[str, List[str]]:
+        """Начинает или продолжает эпоху обхода. Возвращает незавершенные URL по стадиям"""
+        await self.collection.create_index([('epoch', 1), ('status', 1)])
+
+        state = await self.state_collection.find_one({'_id': STATE_ID}) or {}
+        pending: Dict[str, List[str]] = defaultdict(list)
+        self._finished = set()
+
+        if state and not state.get('finished', True):
+            self.epoch = state['epoch']
+            cursor = self.collection.find({'epoch': self.epoch}, {'stage': 1, 'status': 1}, batch_size=5000)
+            async for entry in cursor:
+                if entry['status'] == FrontierStatus.PENDING:
+                    pending[entry['stage']].append(entry['_id'])
+                else:
+                    self._finished.add(entry['_id'])
+            logger.info(
+                f"Продолжение обхода, эпоха {self.epoch}: завершено={len(self._finished)}, "
+                f"в очереди={sum(len(urls) for urls in pending.values())}"
+            )
+        else:
+            self.epoch = state.get('epoch', 0) + 1
+            logger.info(f"Новый обход, эпоха {self.epoch}")
+
+        await self.state_collection.update_one(
+            {'_id': STATE_ID},
+            {'$set': {'epoch': self.epoch, 'finished': False, 'started_at': datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+
+        self.active = True
+        self._writer.start()
+        return pending
+
+    async def finish_run(self):
+        """Отмечает эпоху завершенной: следующий запуск начнет новую"""
+        await self._writer.flush()
+        await self.state_collection.update_one(
+            {'_id': STATE_ID},
+            {'$set': {'finished': True, 'finished_at': datetime.now(timezone.utc)}},
+        )
+        logger.info(f"Эпоха {self.epoch} завершена")
+
+    async def close(self):
+        await self._writer.close()
+        self.active = False
+
+    def is_finished(self, url: str) -> bool:
+        return self.active and url in self._finished
+
+    async def add(self, url: str, stage: str):
+        """Регистрирует URL, поставленный в очередь стадии"""
+        await self._put(url, {'stage': stage, 'status': FrontierStatus.PENDING})
+
+    async def mark_done(self, url: str, stage: str):
+        self._finished.add(url)
+        await self._put(url, {'stage': stage, 'status': FrontierStatus.DONE, 'last_error': None}, attempt=True)
+
+    async def mark_failed(self, url: str, stage: str, error: str, retry: bool):
+        """Записывает ошибку; при retry=True URL останется в очереди для следующего запуска"""
+        status = FrontierStatus.PENDING if retry else FrontierStatus.FAILED
+        if not retry:
+            self._finished.add(url)
+        await self._put(url, {'stage': stage, 'status': status, 'last_error': error}, attempt=True)
+
+    async def _put(self, url: str, fields: dict, attempt: bool = False):
+        if not self.active:
+            return
+
+        fields.update(epoch=self.epoch, updated_at=datetime.now(timezone.utc))
+        update = {'$set': fields}
+        if attempt:
+            update['$inc'] = {'attempts': 1}
+
+        # Последняя операция по URL заменяет предыдущую в пределах пакета
+        await self._writer.put(url, UpdateOne({'_id': url}, update, upsert=True))
@@ -1,9 +1,15 @@
+import importlib.util
 import logging
+from typing import List, Union
+
 from motor.motor_asyncio import AsyncIOMotorClient
 from src.core.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Сжатие -> модуль, без которого драйвер его не поддерживает (zlib есть всегда)
+COMPRESSOR_MODULES = {'zstd': 'zstandard', 'snappy': 'snappy', 'zlib': None}
+
 
 class MongoClient:
     def __init__(self):
@@ -11,10 +17,59 @@ class MongoClient:
         self.database = None
 
     async def connect(self):
-        self.client = AsyncIOMotorClient(settings.mongo_url)
+        compressors = self._available_compressors()
+        options = dict(
+            maxPoolSize=settings.mongo_max_pool_size,
+            minPoolSize=settings.mongo_min_pool_size,
+            serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+            connectTimeoutMS=settings.mongo_connect_timeout_ms,
+            socketTimeoutMS=settings.mongo_socket_timeout_ms,
+            w=self._write_concern(settings.mongo_write_concern),
+            journal=settings.mongo_journal,
+        )
+        if compressors:
+            options['compressors'] = ','.join(compressors)
+
+        self.client = AsyncIOMotorClient(settings.mongo_url, **options)
         await self.client.admin.command('ping')
         self.database = self.client[settings.db_name]
-        logger.info(f"MongoDB подключен: {settings.db_name}")
+        logger.info(
+            f"MongoDB подключен: {settings.db_name}, пул={settings.mongo_max_pool_size}, "
+            f"w={settings.mongo_write_concern}, j={settings.mongo_journal}, сжатие={','.join(compressors) or 'нет'}"
+        )
+        await self._ensure_indexes()
+
+    @staticmethod
+    def _write_concern(value: str) -> Union[int, str]:
+        # "1", "2" - число узлов, остальное ("majority", имя тега) передается как есть
+        return int(value) if value.isdigit() else value
+
+    @staticmethod
+    def _available_compressors() -> List[str]:
+        available = []
+        for name in settings.mongo_compressors:
+            if name not in COMPRESSOR_MODULES:
+                logger.warning(f"Неизвестное сжатие MongoDB: {name}")
+            elif COMPRESSOR_MODULES[name] and importlib.util.find_spec(COMPRESSOR_MODULES[name]) is None:
+                logger.warning(f"Сжатие {name} включено в настройках, но пакет {COMPRESSOR_MODULES[name]} не установлен")
+            else:
+                available.append(name)
+        return available
+
+    async def _ensure_indexes(self):
+        # Уникальный индекс по артикулу: upsert без сканирования коллекции
+        products = self.database[settings.collection_name]
+        try:
+            await products.create_index('article', unique=True)
+        except Exception as e:
+            logger.error(f"Не удалось создать индекс по артикулу: {e}")
+
+        # Поиск товара по URL страницы (обновление last_seen при 304)
+        await products.create_index('suppliers.supplier_offers.purchase_url')
+
+        # Инкрементальная выгрузка каталога по времени изменения или эпохе обхода
+        await products.create_index('updated_at')
+        await products.create_index('crawl_epoch')
 
     async def disconnect(self):
         if self.client:
@@ -0,0 +1,179 @@
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure
+
+from src.core.metrics import metrics
+from src.core.settings import settings
+from src.repository.mongo_client import mongo_client
+
+logger = logging.getLogger(__name__)
+
+# Коды наличия: строка со страницы -> число в истории (None - неизвестно).
+# Порядок важен: "нет в наличии" проверяется раньше "в наличии"
+STOCK_CODES = (
+    ('нет в наличии', 0),
+    ('в наличии', 1),
+    ('под заказ', 2),
+    # Часть товаров показывает вместо наличия примерное количество на складе
+    ('мало', 3),
+    ('много', 4),
+)
+# Значение парсера, когда блока наличия на странице нет
+STOCK_MISSING = 'Нет данных'
+
+# (цена, код наличия, текст наличия без кода)
+Observation = Tuple[Optional[float], Optional[int], Optional[str]]
+
+
+def stock_code(stock: Optional[str]) -> Optional[int]:
+    if not stock:
+        return None
+    stock = stock.casefold()
+    for text, code in STOCK_CODES:
+        if text in stock:
+            return code
+    return None
+
+
+def make_observation(price: Optional[float], stock: Optional[str]) -> Observation:
+    """Незнакомая формулировка наличия сохраняется текстом, чтобы не потерять ее изменения"""
+    code = stock_code(stock)
+    text = stock.strip() if code is None and stock and stock != STOCK_MISSING else None
+    return price or None, code, text
+
+
+class PriceHistory:
+    """История цен и наличия: строка (артикул, время, цена, код наличия) на каждое изменение.
+
+    Хранится в time-series коллекции MongoDB (metaField - артикул), на
+    серверах без time-series - в обычной коллекции с индексом (артикул,
+    время). Последнее значение каждого артикула держится в памяти, поэтому
+    повторное наблюдение той же цены ничего не пишет. Строка пишется только
+    после записи операции товара, с которой она пришла.
+    """
+
+    def __init__(self):
+        self._last: Dict[str, Observation] = {}
+        self.rows_written = 0
+
+    @property
+    def collection(self):
+        return mongo_client.get_collection(settings.price_history_collection_name)
+
+    async def start(self):
+        await self.ensure_collection()
+        await self.load_last()
+
+    async def ensure_collection(self):
+        name = settings.price_history_collection_name
+        try:
+            await mongo_client.database.create_collection(
+                name, timeseries={'timeField': 'ts', 'metaField': 'article', 'granularity': 'hours'}
+            )
+            logger.info(f"Создана time-series коллекция истории цен: {name}")
+        except CollectionInvalid:
+            pass
+        except OperationFailure as e:
+            # MongoDB до 5.0: обычная коллекция, строки те же
+            logger.warning(f"Time-series коллекции недоступны, история цен в обычной коллекции: {e}")
+
+        # Выборка ряда артикула за период и последнего значения идет по индексу
+        await self.collection.create_index([('article', ASCENDING), ('ts', ASCENDING)])
+
+    async def load_last(self):
+        """Заполняет последние значения из текущих цены и наличия товаров каталога.
+
+        Строки истории пишутся тем же пакетом, что и документы товаров, поэтому
+        цена в документе совпадает с последней строкой истории: читать саму
+        историю, которая только растет, не нужно. При пустой истории значения
+        не заполняются, и первое наблюдение каждого товара запишет начальную строку.
+        """
+        self._last = {}
+        if await self.collection.find_one({}, {'_id': 1}) is None:
+            logger.info("История цен пуста: начальные значения запишутся при первом наблюдении")
+            return
+
+        projection = {
+            '_id': 0,
+            'article': 1,
+            'suppliers.supplier_offers.price': 1,
+            'suppliers.supplier_offers.stock': 1,
+        }
+        products = mongo_client.get_collection(settings.collection_name)
+        async for document in products.find({}, projection, batch_size=5000):
+            # Как и при наблюдении, в историю идет первое предложение товара
+            offers = [offer for supplier in document.get('suppliers', []) for offer in supplier.get('supplier_offers', [])]
+            if not offers:
+                continue
+            prices = offers[0].get('price') or [{}]
+            self._last[document['article']] = make_observation(prices[0].get('price'), offers[0].get('stock'))
+        logger.info(f"Загружено последних цен из каталога: {len(self._last)}")
+
+    def observe(self, article: str, price: Optional[float], stock: Optional[str], ts: datetime) -> Optional[dict]:
+        """Строка истории, если цена или наличие изменились; пишется вместе с товаром через write()"""
+        observation = make_observation(price, stock)
+        if self._last.get(article) == observation:
+            return None
+
+        self._last[article] = observation
+        price, code, text = observation
+        row = {'article': article, 'ts': ts, 'price': price, 'stock': code}
+        if text is not None:
+            row['stock_text'] = text
+        return row
+
+    def forget(self, article: str):
+        """Незаписанный товар: следующее наблюдение должно записаться снова"""
+        self._last.pop(article, None)
+
+    async def write(self, rows: List[dict]):
+        if not rows:
+            return
+
+        collection_name = settings.price_history_collection_name
+        metrics.mongo_write_ops.inc(collection_name, amount=len(rows))
+        started = time.perf_counter()
+        try:
+            await self.collection.insert_many(rows, ordered=False)
+            self.rows_written += len(rows)
+        except BulkWriteError as e:
+            write_errors = (e.details or {}).get('writeErrors', [])
+            metrics.mongo_write_errors.inc(collection_name, amount=len(write_errors))
+            self.rows_written += len(rows) - len(write_errors)
+            for write_error in write_errors:
+                self.forget(rows[write_error['index']]['article'])
+            logger.error(f"Ошибки записи истории цен: {len(write_errors)} из {len(rows)}")
+        except Exception as e:
+            metrics.mongo_write_errors.inc(collection_name, amount=len(rows))
+            for row in rows:
+                self.forget(row['article'])
+            logger.error(f"Ошибка записи истории цен ({len(rows)} строк): {e}")
+        finally:
+            metrics.mongo_write_seconds.observe(time.perf_counter() - started, collection_name)
+
+    async def price_series(self, article: str, start: datetime, end: datetime) -> List[dict]:
+        """Ряд цен и наличия артикула за период [start, end).
+
+        История хранит только изменения, поэтому первой строкой идет последнее
+        значение до start - цена, действовавшая на начало периода. Оба
+        запроса идут по индексу (артикул, время) без сканирования коллекции.
+        """
+        projection = {'_id': 0, 'ts': 1, 'price': 1, 'stock': 1, 'stock_text': 1}
+        series = []
+
+        previous = await self.collection.find_one(
+            {'article': article, 'ts': {'$lt': start}}, projection, sort=[('ts', DESCENDING)]
+        )
+        if previous:
+            series.append(previous)
+
+        cursor = self.collection.find(
+            {'article': article, 'ts': {'$gte': start, '$lt': end}}, projection
+        ).sort('ts', ASCENDING)
+        async for row in cursor:
+            series.append(row)
+        return series
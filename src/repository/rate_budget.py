@@ -0,0 +1,57 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from src.core.settings import settings
+from src.repository.mongo_client import mongo_client
+
+logger = logging.getLogger(__name__)
+
+
+class GlobalRateBudget:
+    """Общий для всех воркеров лимит запросов в секунду на хост.
+
+    На каждую секунду и хост заводится документ-окно со счетчиком выданных
+    запросов. Воркер атомарно увеличивает счетчик текущего окна; если лимит
+    окна исчерпан, ждет следующей секунды. Старые окна удаляет TTL индекс.
+    """
+
+    def __init__(self, rps: int):
+        self.rps = rps
+
+    @property
+    def collection(self):
+        return mongo_client.get_collection(settings.rate_budget_collection_name)
+
+    async def ensure_indexes(self):
+        await self.collection.create_index('expires_at', expireAfterSeconds=0)
+
+    async def take(self, host: str):
+        while True:
+            now = time.time()
+            window = int(now)
+            if await self._increment(host, window) <= self.rps:
+                return
+            # Окно исчерпано: ждем начала следующей секунды
+            await asyncio.sleep(window + 1 - now)
+
+    async def _increment(self, host: str, window: int) -> int:
+        key = {'_id': f'{host}:{window}'}
+        update = {
+            '$inc': {'count': 1},
+            '$setOnInsert': {'expires_at': datetime.now(timezone.utc) + timedelta(minutes=1)},
+        }
+        try:
+            document = await self.collection.find_one_and_update(
+                key, update, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Два воркера одновременно создали окно: повторяем уже без вставки
+            document = await self.collection.find_one_and_update(
+                key, update, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        return document['count']
@@ -0,0 +1,176 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from pymongo import UpdateOne
+
+from src.core.settings import settings
+from src.repository.buffered_writer import BufferedWriter
+from src.repository.mongo_client import mongo_client
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты очереди: новые URL раньше любых плановых проверок
+PRIORITY_NEW = 0
+PRIORITY_RECRAWL = 1
+
+
+class ScheduleEntry:
+    __slots__ = ('interval', 'next_due', 'priority', 'checks', 'changes')
+
+    def __init__(self, interval: float, next_due: float, priority: int, checks: int = 0, changes: int = 0):
+        self.interval = interval
+        self.next_due = next_due
+        self.priority = priority
+        self.checks = checks
+        self.changes = changes
+
+
+class RecrawlSchedule:
+    """Расписание повторной загрузки товаров по частоте их изменений.
+
+    Каждый URL имеет свой интервал проверки: после изменения он сокращается
+    вдвое, после проверки без изменений растет в полтора раза, в пределах
+    schedule_min_interval..schedule_max_interval. Сроки хранятся в куче по
+    времени проверки; URL с наступившим сроком переходят во вторую кучу по
+    (приоритет, срок), где новые URL идут первыми. Приоритет действует только
+    среди уже готовых к проверке URL: отложенный новый URL не задерживает
+    просроченные. Интервалы и сроки хранятся в MongoDB и переживают перезапуск.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, ScheduleEntry] = {}
+        # (срок, URL) и готовые к проверке (приоритет, срок, URL);
+        # устаревшие записи обеих куч пропускаются при извлечении
+        self._heap: List[Tuple[float, str]] = []
+        self._ready: List[Tuple[int, float, str]] = []
+        self._wakeup = asyncio.Event()
+        self._writer = BufferedWriter(settings.schedule_collection_name, settings.mongo_batch_size, 'расписания')
+
+    @property
+    def collection(self):
+        return mongo_client.get_collection(settings.schedule_collection_name)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._entries
+
+    async def start(self):
+        """Загружает расписание и запускает периодический сброс изменений"""
+        self._entries = {}
+        async for document in self.collection.find({'removed': {'$ne': True}}, batch_size=5000):
+            self._entries[document['_id']] = ScheduleEntry(
+                interval=document['interval'],
+                next_due=document['next_due'].replace(tzinfo=timezone.utc).timestamp(),
+                priority=document.get('priority', PRIORITY_RECRAWL),
+                checks=document.get('checks', 0),
+                changes=document.get('changes', 0),
+            )
+        self._heap = [(entry.next_due, url) for url, entry in self._entries.items()]
+        heapq.heapify(self._heap)
+        self._ready = []
+        logger.info(f"Загружено URL в расписании: {len(self._entries)}")
+        self._writer.start()
+
+    async def close(self):
+        await self._writer.close()
+
+    async def add(self, url: str, known: bool = False) -> bool:
+        """Добавляет URL из листинга. Возвращает False, если он уже в расписании.
+
+        Новый товар проверяется немедленно и раньше всех. Товар, который уже
+        есть в базе, но не в расписании (первый запуск), получает начальный
+        интервал со случайным сроком, чтобы весь каталог не пришелся на один час.
+        """
+        if url in self._entries:
+            return False
+
+        interval = settings.schedule_initial_interval
+        if known:
+            entry = ScheduleEntry(interval, time.time() + random.uniform(0, interval), PRIORITY_RECRAWL)
+        else:
+            entry = ScheduleEntry(interval, time.time(), PRIORITY_NEW)
+        self._entries[url] = entry
+        await self._push(url, entry)
+        return True
+
+    async def next_due(self) -> str:
+        """Ждет и извлекает следующий URL, срок проверки которого наступил"""
+        while True:
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                due, url = heapq.heappop(self._heap)
+                entry = self._entries.get(url)
+                if entry is not None and entry.next_due == due:
+                    heapq.heappush(self._ready, (entry.priority, due, url))
+
+            while self._ready:
+                priority, due, url = heapq.heappop(self._ready)
+                entry = self._entries.get(url)
+                if entry is not None and (entry.priority, entry.next_due) == (priority, due):
+                    return url
+
+            delay = self._heap[0][0] - now if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def record(self, url: str, changed: bool):
+        """Учитывает результат проверки и назначает следующую"""
+        entry = self._entries.get(url)
+        if entry is None:
+            return
+
+        entry.checks += 1
+        if changed:
+            entry.changes += 1
+            entry.interval = max(settings.schedule_min_interval, entry.interval / 2)
+        elif entry.priority != PRIORITY_NEW:
+            entry.interval = min(settings.schedule_max_interval, entry.interval * 1.5)
+        entry.priority = PRIORITY_RECRAWL
+        entry.next_due = time.time() + entry.interval
+        await self._push(url, entry)
+
+    async def postpone(self, url: str, failures: int):
+        """Повтор после временной ошибки: срок отодвигается на интервал,
+        удваиваемый с каждой ошибкой подряд; сам интервал не меняется"""
+        entry = self._entries.get(url)
+        if entry is None:
+            return
+        delay = min(settings.schedule_max_interval, entry.interval * 2 ** (failures - 1))
+        entry.next_due = time.time() + delay
+        await self._push(url, entry)
+
+    async def remove(self, url: str):
+        """Товар исчез с сайта: больше не проверяется"""
+        if self._entries.pop(url, None) is not None:
+            await self._writer.put(url, UpdateOne({'_id': url}, {'$set': {'removed': True}}))
+
+    def due_count(self) -> int:
+        now = time.time()
+        return sum(1 for entry in self._entries.values() if entry.next_due <= now)
+
+    async def _push(self, url: str, entry: ScheduleEntry):
+        heapq.heappush(self._heap, (entry.next_due, url))
+        self._wakeup.set()
+
+        await self._writer.put(url, UpdateOne(
+            {'_id': url},
+            {'$set': {
+                'interval': entry.interval,
+                'next_due': datetime.fromtimestamp(entry.next_due, timezone.utc),
+                'priority': entry.priority,
+                'checks': entry.checks,
+                'changes': entry.changes,
+                'removed': False,
+            }},
+            upsert=True,
+        ))
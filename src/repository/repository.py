@@ -1,37 +1,430 @@
+import asyncio
+import hashlib
+import json
 import logging
+import time
+from datetime import datetime, timezone
+from functools import partial
+from enum import Enum
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from pymongo import UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from src.core.metrics import metrics
 from src.core.settings import settings
 from src.repository.mongo_client import mongo_client
+from src.repository.price_history import PriceHistory
 from src.schemas.product import Product
+from src.schemas.record import ProductRecord, price_tiers
 
 logger = logging.getLogger(__name__)
 
+# Поля, которые меняются при каждом сохранении и не входят в хеш содержимого
+VOLATILE_FIELDS = {'_id', 'created_at', 'updated_at', 'last_seen', 'content_hash', 'crawl_epoch'}
+
+# Ключ буфера: ('article', артикул), ('seen', артикул), ('url', url) или ('offer', url)
+BufferKey = Tuple[str, str]
+# Действие после успешной записи операции (валидаторы, отметка в границе обхода, подтверждение задачи)
+OnWritten = Callable[[], Awaitable[None]]
+
+
+class PendingWrite:
+    __slots__ = ('key', 'operation', 'on_written', 'history')
+
+    def __init__(self, key: BufferKey, operation: Union[UpdateOne, UpdateMany]):
+        self.key = key
+        self.operation = operation
+        self.on_written: List[OnWritten] = []
+        # Строки истории цен, которые пишутся только вместе с этой операцией
+        self.history: List[dict] = []
+
+
+# Пакет для писателя
+WriteBatch = List[PendingWrite]
+
+
+class SaveResult(str, Enum):
+    NEW = 'new'
+    CHANGED = 'changed'
+    UNCHANGED = 'unchanged'
+
+
+def compute_content_hash(product_dict: dict) -> str:
+    """Стабильный хеш нормализованного документа товара без изменчивых полей"""
+    content = {key: value for key, value in product_dict.items() if key not in VOLATILE_FIELDS}
+    normalized = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
 
 class ProductRepository:
-    def __init__(self):
+    """Буферизованная запись товаров в MongoDB.
+
+    Операции копятся в буфере и пакетами передаются в ограниченную очередь,
+    которую разбирает отдельная задача-писатель: задержка MongoDB не входит
+    во время обработки товара. Пока очередь заполнена, сохранение ждет, а
+    wait_writable() задерживает загрузку новых страниц.
+
+    С diff_collection каталог только сравнивается: товары, отличающиеся от
+    него, пишутся в отдельную коллекцию, а каталог и last_seen не меняются.
+    """
+
+    def __init__(self, diff_collection: Optional[str] = None):
+        self.diff_collection = diff_collection
+        self.collection_name = diff_collection or settings.collection_name
         self._collection = None
+        # Буфер операций по ключу: повторная операция для того же ключа заменяет предыдущую,
+        # действия после записи обеих сохраняются
+        self._buffer: Dict[BufferKey, PendingWrite] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        # Один писатель: пакеты пишутся в порядке сброса, поздняя запись товара не обгоняется ранней
+        self._write_queue: "asyncio.Queue[WriteBatch]" = asyncio.Queue(maxsize=settings.mongo_write_queue_size)
+        self._writer_task: Optional[asyncio.Task] = None
+        # Сброшено, пока очередь писателя заполнена
+        self._writable = asyncio.Event()
+        self._writable.set()
+
+        # Артикул -> хеш содержимого сохраненного документа (None, если хеша еще нет)
+        self._hashes: Dict[str, Optional[str]] = {}
+        # URL товара -> (артикул, цена, наличие) для обновления цен по листингу
+        self._offers: Dict[str, Tuple[str, Optional[float], Optional[str]]] = {}
+        self._offers_loaded = False
+        self.stats = {result: 0 for result in SaveResult}
+        self.offers_patched = 0
+        # Эпоха обхода, в которой товар последний раз изменился (для инкрементальной выгрузки)
+        self.crawl_epoch: Optional[int] = None
+        # Сравнение с каталогом (--replay) идет по старым страницам из кеша: их цены не наблюдения
+        self.price_history = PriceHistory() if settings.price_history_enabled and not diff_collection else None
 
     @property
     def collection(self):
+        """Коллекция, в которую пишутся товары"""
         if self._collection is None:
-            self._collection = mongo_client.get_collection(settings.collection_name)
+            self._collection = mongo_client.get_collection(self.collection_name)
         return self._collection
 
-    async def save_product(self, product: Product):
-        try:
-            product_dict = product.model_dump()
+    @property
+    def catalog(self):
+        """Каталог, с которым сравниваются товары (совпадает с collection, если нет diff_collection)"""
+        return mongo_client.get_collection(settings.collection_name)
+
+    async def start(self):
+        """Загружает хеши сохраненных товаров, запускает писателя и периодический сброс буфера"""
+        await self.load_hashes()
+        if self.price_history is not None:
+            await self.price_history.start()
+        if self._writer_task is None:
+            self._writer_task = asyncio.create_task(self._write_batches())
+            metrics.queue_depth.track('mongo_write', function=self._write_queue.qsize)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def close(self):
+        """Останавливает периодический сброс, передает остаток буфера и ждет записи всех пакетов"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.drain()
+
+        if self._writer_task:
+            self._writer_task.cancel()
+            await asyncio.gather(self._writer_task, return_exceptions=True)
+            self._writer_task = None
+            self._writable.set()
+
+    async def drain(self):
+        """Передает остаток буфера писателю и ждет записи всех пакетов и действий после записи"""
+        await self.flush()
+        if self._writer_task:
+            if self._write_queue.qsize():
+                logger.info(f"Ожидание записи пакетов: {self._write_queue.qsize()}")
+            await self._write_queue.join()
+
+    async def load_hashes(self):
+        """Загружает в память артикулы и хеши содержимого всех сохраненных товаров"""
+        self._hashes = {}
+        cursor = self.catalog.find({}, {'_id': 0, 'article': 1, 'content_hash': 1}, batch_size=5000)
+        async for document in cursor:
+            self._hashes[document['article']] = document.get('content_hash')
+        logger.info(f"Загружено хешей товаров: {len(self._hashes)}")
+
+    async def load_offers(self):
+        """Загружает в память текущие цену и наличие каждого сохраненного предложения"""
+        self._offers = {}
+        projection = {
+            '_id': 0,
+            'article': 1,
+            'suppliers.supplier_offers.purchase_url': 1,
+            'suppliers.supplier_offers.price': 1,
+            'suppliers.supplier_offers.stock': 1,
+        }
+        cursor = self.catalog.find({}, projection, batch_size=5000)
+        async for document in cursor:
+            for supplier in document.get('suppliers', []):
+                for offer in supplier.get('supplier_offers', []):
+                    prices = offer.get('price') or [{}]
+                    self._offers[offer['purchase_url']] = (
+                        document['article'], prices[0].get('price'), offer.get('stock')
+                    )
+        self._offers_loaded = True
+        logger.info(f"Загружено предложений товаров: {len(self._offers)}")
+
+    def is_known_url(self, url: str) -> bool:
+        return url in self._offers
+
+    def use_conditional(self, url: str) -> bool:
+        """Нужен ли условный запрос: 304 полезен, только если товар по URL уже есть в базе.
+
+        Без загруженных предложений (полный обход) это не проверить; там
+        валидаторы есть только у записанных товаров.
+        """
+        return not self._offers_loaded or url in self._offers
 
-            # Проверяем по артикулу
-            existing = await self.collection.find_one({"article": product.article})
+    async def update_offer(self, url: str, price: Optional[float], stock: Optional[str]) -> bool:
+        """Обновляет только цену и наличие предложения по URL товара.
 
-            if existing:
-                await self.collection.update_one(
-                    {"article": product.article},
-                    {"$set": product_dict}
-                )
-                logger.info(f"Обновлен: {product.article}")
-            else:
-                await self.collection.insert_one(product_dict)
-                logger.info(f"Сохранен: {product.article}")
+        Неизвестные значения (None) не трогаем. Возвращает True, если что-то
+        изменилось и запись поставлена в буфер.
+        """
+        article, old_price, old_stock = self._offers[url]
+        fields = {}
+        if price is not None and price != old_price:
+            fields['suppliers.$[].supplier_offers.$[offer].price'] = price_tiers(price)
+        if stock is not None and stock != old_stock:
+            fields['suppliers.$[].supplier_offers.$[offer].stock'] = stock
+        if not fields:
+            return False
 
+        self._offers[url] = (
+            article,
+            price if price is not None else old_price,
+            stock if stock is not None else old_stock,
+        )
+        # Хеш больше не соответствует документу: следующий полный разбор перезапишет товар
+        self._hashes[article] = None
+        self.offers_patched += 1
+        metrics.products.inc('offer_patched')
+
+        now = datetime.now(timezone.utc)
+        history_row = None
+        if self.price_history is not None:
+            history_row = self.price_history.observe(article, self._offers[url][1], self._offers[url][2], now)
+        fields.update(content_hash=None, updated_at=now, last_seen=now)
+        if self.crawl_epoch is not None:
+            fields['crawl_epoch'] = self.crawl_epoch
+        await self._put(
+            ('offer', url),
+            UpdateOne({"article": article}, {"$set": fields}, array_filters=[{'offer.purchase_url': url}]),
+            history=history_row,
+        )
+        return True
+
+    async def save_product(self, product: ProductRecord, on_written: Optional[OnWritten] = None) -> SaveResult:
+        """Ставит товар в буфер записи.
+
+        on_written вызывается только после того, как пакет с товаром записан
+        в базу; при ошибке записи не вызывается.
+        """
+        product_dict = product.to_document()
+        content_hash = compute_content_hash(product_dict)
+        now = datetime.now(timezone.utc)
+
+        # Цена сравнивается с последней в истории при каждом наблюдении, даже если товар не изменился
+        history_row = None
+        if self.price_history is not None and product.offers:
+            offer = product.offers[0]
+            history_row = self.price_history.observe(product.article, offer.price, offer.stock, now)
+
+        # Неизменившийся товар не перезаписываем: обновляется только last_seen, как при 304
+        if product.article not in self._hashes:
+            result = SaveResult.NEW
+        elif self._hashes[product.article] != content_hash:
+            result = SaveResult.CHANGED
+        else:
+            self.stats[SaveResult.UNCHANGED] += 1
+            metrics.products.inc(SaveResult.UNCHANGED.value)
+            if self.diff_collection:
+                # Писать нечего: товар совпадает с каталогом
+                if on_written is not None:
+                    await on_written()
+                return SaveResult.UNCHANGED
+            await self._put(
+                ('seen', product.article),
+                UpdateOne({"article": product.article}, {"$set": {"last_seen": now}}),
+                on_written,
+                history=history_row,
+            )
+            return SaveResult.UNCHANGED
+
+        # Единственная проверка схемой на пути товара: только перед записью в базу
+        Product.model_validate(product_dict)
+
+        self.stats[result] += 1
+        metrics.products.inc(result.value)
+        self._hashes[product.article] = content_hash
+        product_dict['content_hash'] = content_hash
+        product_dict['updated_at'] = now
+        if not self.diff_collection:
+            product_dict['last_seen'] = now
+        if self.crawl_epoch is not None:
+            product_dict['crawl_epoch'] = self.crawl_epoch
+
+        # Upsert по артикулу вместо find_one + insert/update
+        await self._put(
+            ('article', product.article),
+            UpdateOne({"article": product.article}, {"$set": product_dict}, upsert=True),
+            on_written,
+            partial(self._offers_written, product) if self._offers_loaded else None,
+            history=history_row,
+        )
+        return result
+
+    async def _offers_written(self, product: ProductRecord):
+        # Записанный товар известен: дальше условные запросы и обновление цен по листингу
+        for offer in product.offers:
+            self._offers[offer.purchase_url] = (product.article, offer.price, offer.stock)
+
+    async def touch(self, url: str, on_written: Optional[OnWritten] = None):
+        """Отмечает, что страница товара не изменилась (304): обновляется только last_seen"""
+        metrics.products.inc('not_modified')
+        await self._put(
+            ('url', url),
+            UpdateMany(
+                {"suppliers.supplier_offers.purchase_url": url},
+                {"$set": {"last_seen": datetime.now(timezone.utc)}},
+            ),
+            on_written,
+        )
+
+    async def _put(
+        self,
+        key: BufferKey,
+        operation: Union[UpdateOne, UpdateMany],
+        *on_written: Optional[OnWritten],
+        history: Optional[dict] = None,
+    ):
+        pending = self._buffer.get(key)
+        if pending is None:
+            pending = self._buffer[key] = PendingWrite(key, operation)
+        else:
+            pending.operation = operation
+        pending.on_written.extend(callback for callback in on_written if callback is not None)
+        if history is not None:
+            pending.history.append(history)
+
+        if len(self._buffer) >= settings.mongo_batch_size:
+            await self.flush()
+
+    async def wait_writable(self):
+        """Ждет, пока у писателя освободится место в очереди (вызывается перед загрузкой страницы)"""
+        await self._writable.wait()
+
+    def log_stats(self):
+        logger.info(
+            f"Товары за запуск: новых={self.stats[SaveResult.NEW]}, "
+            f"изменено={self.stats[SaveResult.CHANGED]}, "
+            f"без изменений={self.stats[SaveResult.UNCHANGED]}"
+        )
+        if self.offers_patched:
+            logger.info(f"Обновлено цен и наличия по листингу: {self.offers_patched}")
+        if self.price_history is not None:
+            logger.info(f"Записано изменений в историю цен: {self.price_history.rows_written}")
+
+    async def flush(self):
+        """Передает накопленные операции писателю; без запущенного писателя пишет сразу"""
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+
+            batch = list(self._buffer.values())
+            self._buffer = {}
+            if self._writer_task is None:
+                await self._write(batch)
+                return
+
+            # При заполненной очереди ждем писателя; загрузка новых страниц приостанавливается
+            await self._write_queue.put(batch)
+            if self._write_queue.full() and self._writable.is_set():
+                logger.warning("Запись в MongoDB не успевает за обходом, загрузка страниц приостановлена")
+                self._writable.clear()
+
+    async def _write_batches(self):
+        while True:
+            batch = await self._write_queue.get()
+            try:
+                await self._write(batch)
+            finally:
+                self._write_queue.task_done()
+                if not self._write_queue.full():
+                    self._writable.set()
+
+    async def _write(self, batch: List[PendingWrite]):
+        """Записывает пакет товаров одним неупорядоченным bulk_write.
+
+        Строки истории цен и действия после записи - только для записанных
+        операций: операции из writeErrors и весь пакет при любой другой
+        ошибке их не получают, иначе история разошлась бы с каталогом.
+        """
+        collection_name = self.collection_name
+        metrics.mongo_write_ops.inc(collection_name, amount=len(batch))
+        started = time.perf_counter()
+        failed = set()
+
+        try:
+            result = await self.collection.bulk_write([pending.operation for pending in batch], ordered=False)
+            metrics.mongo_write_seconds.observe(time.perf_counter() - started, collection_name)
+            logger.info(
+                f"Записан пакет из {len(batch)}: новых={result.upserted_count}, "
+                f"обновлено={result.modified_count}"
+            )
+        except BulkWriteError as e:
+            metrics.mongo_write_seconds.observe(time.perf_counter() - started, collection_name)
+            write_errors = (e.details or {}).get('writeErrors', [])
+            metrics.mongo_write_errors.inc(collection_name, amount=len(write_errors))
+            self._log_bulk_errors(e, len(batch))
+            failed = {write_error['index'] for write_error in write_errors}
+            self._forget_failed([batch[index] for index in failed])
         except Exception as e:
-            logger.error(f"Ошибка сохранения: {e}")
\ No newline at end of file
+            metrics.mongo_write_errors.inc(collection_name, amount=len(batch))
+            logger.error(f"Ошибка сохранения пакета из {len(batch)}: {e}")
+            self._forget_failed(batch)
+            return
+
+        written = [pending for index, pending in enumerate(batch) if index not in failed]
+        if self.price_history is not None:
+            await self.price_history.write([row for pending in written for row in pending.history])
+
+        callbacks = [callback for pending in written for callback in pending.on_written]
+        results = await asyncio.gather(*(callback() for callback in callbacks), return_exceptions=True)
+        for error in results:
+            if isinstance(error, Exception):
+                logger.error(f"Ошибка обработки записанного товара: {error}")
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(settings.mongo_flush_interval)
+            await self.flush()
+
+    def _forget_failed(self, failed: List[PendingWrite]):
+        # Незаписанные товары должны снова считаться измененными, а их цены - ненаблюдавшимися
+        for pending in failed:
+            kind, value = pending.key
+            if kind == 'article':
+                self._hashes.pop(value, None)
+            if self.price_history is not None:
+                for row in pending.history:
+                    self.price_history.forget(row['article'])
+
+    @staticmethod
+    def _log_bulk_errors(error: BulkWriteError, batch_size: int):
+        details = error.details or {}
+        write_errors = details.get('writeErrors', [])
+        logger.error(
+            f"Ошибки в пакете из {batch_size}: ошибок={len(write_errors)}, "
+            f"новых={details.get('nUpserted', 0)}, обновлено={details.get('nModified', 0)}"
+        )
+        for write_error in write_errors[:10]:
+            article = write_error.get('op', {}).get('q', {}).get('article')
+            logger.error(f"  артикул {article}: {write_error.get('errmsg')}")
@@ -0,0 +1,69 @@
+import logging
+from typing import Dict, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from src.core.settings import settings
+from src.repository.mongo_client import mongo_client
+
+logger = logging.getLogger(__name__)
+
+# (ETag, Last-Modified)
+Validators = Tuple[Optional[str], Optional[str]]
+
+
+class ValidatorStore:
+    """Хранилище валидаторов HTTP кеша (ETag / Last-Modified) по URL.
+
+    Все валидаторы держатся в памяти, в MongoDB изменения пишутся пакетами.
+    """
+
+    def __init__(self):
+        self._validators: Dict[str, Validators] = {}
+        self._pending: Dict[str, Validators] = {}
+        self._loaded = False
+
+    @property
+    def collection(self):
+        return mongo_client.get_collection(settings.validators_collection_name)
+
+    async def load(self):
+        self._validators = {}
+        async for document in self.collection.find({}, batch_size=5000):
+            self._validators[document['_id']] = (document.get('etag'), document.get('last_modified'))
+        self._loaded = True
+        logger.info(f"Загружено HTTP валидаторов: {len(self._validators)}")
+
+    def get(self, url: str) -> Optional[Validators]:
+        return self._validators.get(url)
+
+    async def remember(self, url: str, etag: Optional[str], last_modified: Optional[str]):
+        """Запоминает валидаторы URL; вызывается после успешного сохранения товара"""
+        if not self._loaded or not (etag or last_modified):
+            return
+
+        validators = (etag, last_modified)
+        if self._validators.get(url) == validators:
+            return
+
+        self._validators[url] = validators
+        self._pending[url] = validators
+        if len(self._pending) >= settings.mongo_batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        operations = [
+            UpdateOne({'_id': url}, {'$set': {'etag': etag, 'last_modified': last_modified}}, upsert=True)
+            for url, (etag, last_modified) in pending.items()
+        ]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения HTTP валидаторов ({len(operations)}): {e}")
+
+
+validator_store = ValidatorStore()
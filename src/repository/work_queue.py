@@ -0,0 +1,179 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+
+from src.core.settings import settings
+from src.repository.mongo_client import mongo_client
+
+logger = logging.getLogger(__name__)
+
+STATE_ID = 'work_queue'
+
+# Более поздние стадии забираются первыми: начатая работа завершается раньше новой
+STAGE_PRIORITY = {'fetch': 0, 'listings': 1, 'categories': 2}
+
+
+class TaskStatus:
+    PENDING = 'pending'
+    LEASED = 'leased'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+class WorkQueue:
+    """Общая очередь задач обхода в MongoDB для нескольких процессов-воркеров.
+
+    Задача - документ с _id = URL, стадией и статусом. Воркер забирает задачу
+    атомарно через find_one_and_update и получает аренду на work_lease_seconds;
+    если воркер упал и не подтвердил задачу, после истечения аренды она
+    возвращается в очередь. Повторная постановка того же URL в пределах
+    запуска ничего не меняет, поэтому товар из нескольких категорий
+    загружается один раз на все воркеры.
+    """
+
+    def __init__(self, worker_id: str = ''):
+        self.worker_id = worker_id
+        self.run = 0
+
+    @property
+    def collection(self):
+        return mongo_client.get_collection(settings.work_queue_collection_name)
+
+    @property
+    def state_collection(self):
+        return mongo_client.get_collection(settings.crawl_state_collection_name)
+
+    async def ensure_indexes(self):
+        await self.collection.create_index(
+            [('status', ASCENDING), ('priority', ASCENDING), ('available_at', ASCENDING)]
+        )
+        await self.collection.create_index([('status', ASCENDING), ('lease_until', ASCENDING)])
+
+    async def begin_run(self) -> bool:
+        """Начинает запуск координатора. Возвращает True, если продолжается прерванный запуск"""
+        await self.ensure_indexes()
+        state = await self.state_collection.find_one({'_id': STATE_ID}) or {}
+
+        resumed = bool(state) and not state.get('finished', True)
+        if resumed:
+            self.run = state['run']
+            logger.info(f"Продолжение распределенного обхода, запуск {self.run}")
+        else:
+            self.run = state.get('run', 0) + 1
+            # Задачи прошлого завершенного запуска больше не нужны
+            await self.collection.delete_many({})
+            logger.info(f"Новый распределенный обход, запуск {self.run}")
+
+        await self.state_collection.update_one(
+            {'_id': STATE_ID},
+            {'$set': {'run': self.run, 'finished': False, 'started_at': datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        return resumed
+
+    async def finish_run(self):
+        await self.state_collection.update_one(
+            {'_id': STATE_ID},
+            {'$set': {'finished': True, 'finished_at': datetime.now(timezone.utc)}},
+        )
+        logger.info(f"Распределенный обход {self.run} завершен")
+
+    async def is_run_active(self) -> bool:
+        state = await self.state_collection.find_one({'_id': STATE_ID})
+        if state:
+            self.run = state['run']
+        return bool(state) and not state.get('finished', True)
+
+    async def enqueue(self, stage: str, tasks: Dict[str, dict]) -> int:
+        """Ставит задачи (URL -> данные задачи) в очередь стадии.
+
+        Уже известные URL пропускаются. Возвращает число новых задач.
+        """
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateOne(
+                {'_id': url},
+                {'$setOnInsert': {
+                    'stage': stage,
+                    'priority': STAGE_PRIORITY.get(stage, 0),
+                    'status': TaskStatus.PENDING,
+                    'payload': payload,
+                    'attempts': 0,
+                    'available_at': now,
+                    'created_at': now,
+                }},
+                upsert=True,
+            )
+            for url, payload in tasks.items()
+        ]
+        if not operations:
+            return 0
+
+        result = await self.collection.bulk_write(operations, ordered=False)
+        return result.upserted_count
+
+    async def claim(self) -> Optional[dict]:
+        """Атомарно забирает доступную задачу в аренду"""
+        now = datetime.now(timezone.utc)
+        return await self.collection.find_one_and_update(
+            {'status': TaskStatus.PENDING, 'available_at': {'$lte': now}},
+            {
+                '$set': {
+                    'status': TaskStatus.LEASED,
+                    'lease_owner': self.worker_id,
+                    'lease_until': now + timedelta(seconds=settings.work_lease_seconds),
+                },
+                '$inc': {'attempts': 1},
+            },
+            sort=[('priority', ASCENDING), ('available_at', ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def ack(self, task: dict):
+        """Подтверждает выполнение; чужую аренду (истекшую и переданную другому) не трогает"""
+        await self._finish(task, {'status': TaskStatus.DONE, 'last_error': None})
+
+    async def retry(self, task: dict, error: str, delay: float):
+        """Возвращает задачу в очередь через delay секунд или помечает ее проваленной"""
+        if task.get('attempts', 0) >= settings.work_max_attempts:
+            await self.fail(task, error)
+            return
+        available_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        await self._finish(task, {'status': TaskStatus.PENDING, 'available_at': available_at, 'last_error': error})
+
+    async def fail(self, task: dict, error: str):
+        await self._finish(task, {'status': TaskStatus.FAILED, 'last_error': error})
+
+    async def _finish(self, task: dict, fields: dict):
+        fields.update(updated_at=datetime.now(timezone.utc), lease_owner=None, lease_until=None)
+        await self.collection.update_one(
+            {'_id': task['_id'], 'status': TaskStatus.LEASED, 'lease_owner': self.worker_id},
+            {'$set': fields},
+        )
+
+    async def reclaim_expired(self) -> int:
+        """Возвращает в очередь задачи с истекшей арендой (воркер упал или завис)"""
+        expired = {'status': TaskStatus.LEASED, 'lease_until': {'$lt': datetime.now(timezone.utc)}}
+        released = {'lease_owner': None, 'lease_until': None}
+
+        # Задача, на которой воркеры раз за разом падают, не должна возвращаться бесконечно
+        await self.collection.update_many(
+            {**expired, 'attempts': {'$gte': settings.work_max_attempts}},
+            {'$set': {'status': TaskStatus.FAILED, 'last_error': 'lease expired', **released}},
+        )
+        result = await self.collection.update_many(
+            expired,
+            {'$set': {'status': TaskStatus.PENDING, **released}},
+        )
+        if result.modified_count:
+            logger.warning(f"Возвращено в очередь задач с истекшей арендой: {result.modified_count}")
+        return result.modified_count
+
+    async def counts(self) -> Dict[str, int]:
+        """Число задач по статусам"""
+        counts = {status: 0 for status in (TaskStatus.PENDING, TaskStatus.LEASED, TaskStatus.DONE, TaskStatus.FAILED)}
+        async for row in self.collection.aggregate([{'$group': {'_id': '$status', 'count': {'$sum': 1}}}]):
+            counts[row['_id']] = row['count']
+        return counts
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
 
@@ -43,4 +43,11 @@ class Product(BaseModel):
         default_factory=lambda: datetime.now().strftime("%d.%m.%Y %H:%M")
     )
     attributes: List[Attribute] = Field(default_factory=list)
-    suppliers: List[Supplier] = Field(default_factory=list)
\ No newline at end of file
+    suppliers: List[Supplier] = Field(default_factory=list)
+
+
+class ListingItem(BaseModel):
+    """Товар, как он виден на странице листинга категории"""
+    url: str
+    price: Optional[float] = None
+    stock: Optional[str] = None
\ No newline at end of file
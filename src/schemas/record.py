@@ -0,0 +1,71 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Tuple
+
+# Поставщик у всех товаров один: данные не копируются в каждый товар,
+# а подставляются при сборке документа
+SUPPLIER = {
+    'dealer_id': 'Нет данных',
+    'supplier_name': 'КанцМир',
+    'supplier_tel': '+7 (499) 199-59-60',
+    'supplier_address': '123154, г. Москва, ул. Генерала Глаголева, 6 корпус 1',
+    'supplier_description': 'Интернет-магазин канцелярских товаров',
+}
+
+
+def price_tiers(price: float) -> List[dict]:
+    """Цены предложения в формате PriceInfo: одна цена за штуку без скидки"""
+    return [{'qnt': 1, 'discount': 0.0, 'price': price}]
+
+
+@dataclass(slots=True)
+class OfferRecord:
+    price: float
+    stock: str
+    delivery_time: str
+    package_info: str
+    purchase_url: str
+
+    def to_document(self) -> dict:
+        return {
+            'price': price_tiers(self.price),
+            'stock': self.stock,
+            'delivery_time': self.delivery_time,
+            'package_info': self.package_info,
+            'purchase_url': self.purchase_url,
+        }
+
+
+@dataclass(slots=True)
+class ProductRecord:
+    """Компактное внутреннее представление товара для горячего пути разбора и записи.
+
+    Без валидации и вложенных моделей: атрибуты - пары (название, значение),
+    данные поставщика общие (SUPPLIER). to_document() собирает документ
+    в той же структуре, что Product.model_dump(), поэтому формат хранения
+    не меняется; проверка схемой Product выполняется один раз при записи.
+    """
+    title: str
+    description: str
+    article: str
+    brand: str
+    country_of_origin: str
+    category: str
+    attributes: List[Tuple[str, str]]
+    offers: List[OfferRecord]
+    warranty_months: str = 'Нет данных'
+    created_at: str = field(default_factory=lambda: datetime.now().strftime("%d.%m.%Y %H:%M"))
+
+    def to_document(self) -> dict:
+        return {
+            'title': self.title,
+            'description': self.description,
+            'article': self.article,
+            'brand': self.brand,
+            'country_of_origin': self.country_of_origin,
+            'warranty_months': self.warranty_months,
+            'category': self.category,
+            'created_at': self.created_at,
+            'attributes': [{'attr_name': name, 'attr_value': value} for name, value in self.attributes],
+            'suppliers': [{**SUPPLIER, 'supplier_offers': [offer.to_document() for offer in self.offers]}],
+        }
@@ -0,0 +1,63 @@
+import importlib.util
+import logging
+from typing import Optional
+
+import httpx
+
+from src.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClient:
+    """Общий долгоживущий HTTP клиент с пулом соединений"""
+
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+        self.http2 = False
+
+    async def connect(self):
+        if self.client is None:
+            self.client = self._create_client()
+            logger.info(
+                f"HTTP клиент создан: соединений={settings.http_max_connections}, "
+                f"keep-alive={settings.http_max_keepalive_connections}, http2={self.http2}"
+            )
+
+    async def disconnect(self):
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    def get_client(self) -> httpx.AsyncClient:
+        # Клиент создается лениво, если connect() не был вызван явно
+        if self.client is None:
+            self.client = self._create_client()
+        return self.client
+
+    @staticmethod
+    def _http2_available() -> bool:
+        # HTTP/2 требует пакет h2 (pip install httpx[http2])
+        if not settings.http2:
+            return False
+        if importlib.util.find_spec('h2') is None:
+            logger.warning("HTTP/2 включен в настройках, но пакет h2 не установлен - используется HTTP/1.1")
+            return False
+        return True
+
+    def _create_client(self) -> httpx.AsyncClient:
+        self.http2 = self._http2_available()
+        limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        )
+        return httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=settings.http_timeout,
+            limits=limits,
+            http2=self.http2,
+        )
+
+
+http_client = HttpClient()
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from src.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Статусы, при которых сайт просит снизить нагрузку
+THROTTLE_STATUSES = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Разбирает заголовок Retry-After (секунды или HTTP-дата) в секунды ожидания"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class HostBucket:
+    """Token bucket одного хоста с ограничением числа одновременных запросов"""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.rate = settings.rate_limit_rps
+        self.tokens = float(settings.rate_limit_burst)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.successes = 0
+        self.in_flight = asyncio.Semaphore(settings.rate_limit_max_in_flight)
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.tokens = min(float(settings.rate_limit_burst), self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    async def take(self):
+        # Лок выстраивает ожидающих в очередь, токены выдаются по порядку
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if self.paused_until > now:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_throttle(self, retry_after: Optional[float]):
+        """Мультипликативно снижает скорость и при необходимости ставит паузу"""
+        self.successes = 0
+        self.tokens = 0.0
+        self.rate = max(settings.rate_limit_min_rps, self.rate * settings.rate_limit_backoff_factor)
+
+        if retry_after is not None:
+            delay = min(retry_after, settings.rate_limit_max_retry_after)
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+        logger.warning(f"Сайт {self.host} просит снизить нагрузку: {self.rate:.2f} запр/с, пауза {retry_after or 0:.0f} с")
+
+    def on_success(self):
+        """Постепенно (аддитивно) возвращает скорость к максимуму после серии успешных ответов"""
+        if self.rate >= settings.rate_limit_rps:
+            return
+
+        self.successes += 1
+        if self.successes >= settings.rate_limit_recovery_successes:
+            self.successes = 0
+            self.rate = min(settings.rate_limit_rps, self.rate + settings.rate_limit_recovery_step)
+            logger.info(f"Скорость для {self.host} увеличена до {self.rate:.2f} запр/с")
+
+
+class HourlyBudget:
+    """Общий бюджет запросов в час для долгоживущего режима (RateLimiter.global_budget).
+
+    Token bucket на все хосты: скорость budget/3600 запросов в секунду,
+    запас не больше rate_limit_burst, чтобы после простоя не уйти в залп.
+    """
+
+    def __init__(self, requests_per_hour: int):
+        self.rate = requests_per_hour / 3600
+        self.tokens = float(settings.rate_limit_burst)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self, host: str):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(float(settings.rate_limit_burst), self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """Общий ограничитель запросов: запросы в секунду и число одновременных запросов на хост"""
+
+    def __init__(self):
+        self._buckets: Dict[str, HostBucket] = {}
+        # Общий лимит нескольких воркеров (GlobalRateBudget), задается в распределенном режиме
+        self.global_budget = None
+
+    def _bucket(self, url: str) -> HostBucket:
+        host = urlsplit(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = HostBucket(host)
+        return bucket
+
+    @asynccontextmanager
+    async def acquire(self, url: str):
+        bucket = self._bucket(url)
+        async with bucket.in_flight:
+            await bucket.take()
+            if self.global_budget is not None:
+                await self.global_budget.take(bucket.host)
+            yield
+
+    def record(self, url: str, status_code: int, retry_after: Optional[str] = None):
+        """Учитывает ответ сервера для адаптивной подстройки скорости"""
+        bucket = self._bucket(url)
+        if status_code in THROTTLE_STATUSES:
+            bucket.on_throttle(parse_retry_after(retry_after))
+        elif status_code < 500:
+            bucket.on_success()
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,211 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = '.gz'
+
+
+@dataclass
+class CachedResponse:
+    """Сохраненный ответ сервера"""
+    url: str
+    kind: str
+    status_code: int
+    content: bytes
+    encoding: str = 'utf-8'
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = 0.0
+
+
+class ResponseCache:
+    """Локальный кеш ответов на диске.
+
+    Каждый ответ хранится в отдельном gzip файле: строка JSON с метаданными,
+    затем тело страницы. Путь файла - хеш URL внутри каталога вида страницы
+    (start, listing, product), поэтому для повторного разбора товаров
+    достаточно обойти один каталог. Устаревшие по TTL записи удаляются, а при
+    превышении размера удаляются давно не обновлявшиеся (LRU по mtime;
+    ответ 304 обновляет mtime записи).
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or settings.response_cache_dir
+        # Путь -> (mtime, размер) для вытеснения без повторного обхода диска
+        self._index: Dict[str, Tuple[float, int]] = {}
+        self._total_bytes = 0
+        self._opened = False
+        self._evicting = False
+
+    @property
+    def enabled(self) -> bool:
+        return settings.response_cache_enabled
+
+    def path_for(self, kind: str, url: str) -> str:
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, kind, digest[:2], digest + SUFFIX)
+
+    async def open(self):
+        """Строит индекс кеша и удаляет устаревшие записи"""
+        if not self.enabled or self._opened:
+            return
+        await asyncio.to_thread(self._load_index)
+        await self._evict()
+        self._opened = True
+        logger.info(f"Кеш ответов: записей={len(self._index)}, размер={self._total_bytes / 1024 ** 2:.1f} МБ")
+
+    async def put(
+        self,
+        kind: str,
+        url: str,
+        status_code: int,
+        content: bytes,
+        encoding: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        """Сохраняет ответ; ошибки записи не прерывают загрузку"""
+        if not self._opened:
+            return
+        entry = CachedResponse(url, kind, status_code, content, encoding, etag, last_modified, time.time())
+        try:
+            path, size = await asyncio.to_thread(self._write, entry)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить ответ в кеш: {url} ({e})")
+            return
+
+        self._remember(path, time.time(), size)
+        if self._total_bytes > settings.response_cache_max_bytes:
+            await self._evict()
+
+    async def touch(self, kind: str, url: str):
+        """Отмечает, что закешированная страница не изменилась (ответ 304)"""
+        if not self._opened:
+            return
+        path = self.path_for(kind, url)
+        if path not in self._index:
+            return
+        try:
+            await asyncio.to_thread(os.utime, path)
+        except OSError:
+            return
+        self._remember(path, time.time(), self._index[path][1])
+
+    def iter_paths(self, kind: str) -> Iterator[str]:
+        """Обходит файлы записей одного вида, пропуская устаревшие по TTL"""
+        expires_before = time.time() - settings.response_cache_ttl
+        root = os.path.join(self.directory, kind)
+        if not os.path.isdir(root):
+            return
+
+        for bucket in sorted(os.scandir(root), key=lambda item: item.name):
+            if not bucket.is_dir():
+                continue
+            for item in os.scandir(bucket.path):
+                if item.name.endswith(SUFFIX) and item.stat().st_mtime >= expires_before:
+                    yield item.path
+
+    @staticmethod
+    def read(path: str) -> Optional[CachedResponse]:
+        """Читает запись кеша; поврежденные файлы пропускаются"""
+        try:
+            with gzip.open(path, 'rb') as file:
+                header = json.loads(file.readline())
+                content = file.read()
+        except (OSError, EOFError, ValueError) as e:
+            logger.warning(f"Поврежденная запись кеша {path}: {e}")
+            return None
+        return CachedResponse(content=content, **header)
+
+    def _write(self, entry: CachedResponse) -> Tuple[str, int]:
+        path = self.path_for(entry.kind, entry.url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        header = {
+            'url': entry.url,
+            'kind': entry.kind,
+            'status_code': entry.status_code,
+            'encoding': entry.encoding,
+            'etag': entry.etag,
+            'last_modified': entry.last_modified,
+            'fetched_at': entry.fetched_at,
+        }
+        data = json.dumps(header, ensure_ascii=False).encode('utf-8') + b'\n' + entry.content
+
+        # Запись через временный файл: прерванный процесс не оставит обрезанную запись
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(gzip.compress(data, compresslevel=settings.response_cache_compress_level, mtime=0))
+        os.replace(tmp_path, path)
+        return path, os.path.getsize(path)
+
+    def _remember(self, path: str, mtime: float, size: int):
+        previous = self._index.get(path)
+        if previous:
+            self._total_bytes -= previous[1]
+        self._index[path] = (mtime, size)
+        self._total_bytes += size
+
+    def _load_index(self):
+        self._index = {}
+        self._total_bytes = 0
+        if not os.path.isdir(self.directory):
+            return
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                self._remember(path, stat.st_mtime, stat.st_size)
+
+    async def _evict(self):
+        """Удаляет устаревшие записи, затем самые старые до 90% лимита размера"""
+        if self._evicting:
+            return
+        self._evicting = True
+        try:
+            victims = self._select_victims()
+            if victims:
+                await asyncio.to_thread(self._remove_files, victims)
+                logger.info(f"Из кеша ответов удалено записей: {len(victims)}")
+        finally:
+            self._evicting = False
+
+    def _select_victims(self) -> List[str]:
+        # Индекс меняется только в event loop, поэтому записи выбираются здесь, а удаляются в потоке
+        expires_before = time.time() - settings.response_cache_ttl
+        # Запас в 10%, чтобы не обходить индекс на каждой записи
+        limit = settings.response_cache_max_bytes * 0.9
+        victims = []
+
+        for path, (mtime, _) in sorted(self._index.items(), key=lambda item: item[1][0]):
+            if mtime >= expires_before and self._total_bytes <= limit:
+                break
+            self._total_bytes -= self._index.pop(path)[1]
+            victims.append(path)
+
+        return victims
+
+    @staticmethod
+    def _remove_files(paths: List[str]):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Не удалось удалить запись кеша {path}: {e}")
+
+response_cache = ResponseCache()
@@ -0,0 +1,44 @@
+import random
+from typing import Optional
+
+import httpx
+
+from src.core.settings import settings
+
+# Временные ошибки сервера: запрос имеет смысл повторить
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Сетевые ошибки, после которых запрос повторяется
+RETRY_EXCEPTIONS = (
+    httpx.TimeoutException,
+    httpx.NetworkError,
+    httpx.RemoteProtocolError,
+)
+
+
+class RetryPolicy:
+    """Политика повторов: что повторять и сколько ждать между попытками"""
+
+    def __init__(
+        self,
+        max_attempts: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+    ):
+        self.max_attempts = max_attempts or settings.retry_max_attempts
+        self.backoff_base = backoff_base or settings.retry_backoff_base
+        self.backoff_max = backoff_max or settings.retry_backoff_max
+
+    def should_retry_status(self, status_code: int) -> bool:
+        return status_code in RETRY_STATUSES
+
+    def should_retry_exception(self, error: Exception) -> bool:
+        return isinstance(error, RETRY_EXCEPTIONS)
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Экспоненциальная задержка с полным джиттером (attempt начинается с 1)"""
+        cap = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        delay = random.uniform(0, cap)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, settings.rate_limit_max_retry_after))
+        return delay
@@ -1,16 +1,228 @@
-from typing import Optional
+import asyncio
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import List, Optional, Tuple
 
 import httpx
 import logging
 
+from src.core.metrics import metrics
+from src.core.settings import settings
+from src.repository.validator_store import validator_store
+from src.scrapers.http_client import http_client
+from src.scrapers.rate_limiter import parse_retry_after, rate_limiter
+from src.scrapers.response_cache import response_cache
+from src.scrapers.retry import RetryPolicy
+
 logger = logging.getLogger(__name__)
 
+
+class FetchStatus(str, Enum):
+    OK = 'ok'
+    NOT_MODIFIED = 'not_modified'
+    NOT_FOUND = 'not_found'
+    PERMANENT_ERROR = 'permanent_error'
+    TEMPORARY_ERROR = 'temporary_error'
+
+
+@dataclass
+class FetchResult:
+    """Результат загрузки страницы"""
+    url: str
+    status: FetchStatus
+    status_code: Optional[int] = None
+    content: Optional[bytes] = None
+    encoding: str = 'utf-8'
+    error: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == FetchStatus.OK
+
+    @property
+    def text(self) -> Optional[str]:
+        # Декодирование откладывается: для страниц товаров оно выполняется в процессе-воркере
+        if self.content is None:
+            return None
+        return self.content.decode(self.encoding, errors='replace')
+
+
+class TemporaryFetchError(Exception):
+    """Страница временно недоступна, загрузку стоит повторить позже"""
+
+    def __init__(self, result: FetchResult):
+        super().__init__(f"{result.url}: {result.error or result.status_code}")
+        self.result = result
+
+
+class ResponseTooLarge(Exception):
+    """Тело ответа больше max_response_bytes"""
+
+
 class PageScraper:
-    async def scrape_page(self, url: str) -> Optional[str]:
-        async with httpx.AsyncClient(follow_redirects=True, timeout=30) as client:
+    def __init__(self, retry_policy: Optional[RetryPolicy] = None):
+        self.retry_policy = retry_policy or RetryPolicy()
+
+    async def scrape_page(self, url: str, kind: str = 'page') -> Optional[str]:
+        result = await self.fetch(url, kind=kind)
+        return result.text if result.ok else None
+
+    async def fetch(self, url: str, conditional: bool = False, kind: str = 'page') -> FetchResult:
+        """Загружает страницу с повторами временных ошибок.
+
+        При conditional=True отправляет сохраненные ETag / Last-Modified и
+        возвращает статус NOT_MODIFIED, если страница не менялась (304).
+        kind - вид страницы (start, listing, product), под которым ответ
+        сохраняется в локальный кеш.
+        """
+        result = await self._fetch(url, conditional, kind)
+
+        if result.ok:
+            await response_cache.put(
+                kind, url, result.status_code, result.content, result.encoding,
+                result.etag, result.last_modified,
+            )
+        elif result.status == FetchStatus.NOT_MODIFIED:
+            await response_cache.touch(kind, url)
+        return result
+
+    async def _fetch(self, url: str, conditional: bool, kind: str) -> FetchResult:
+        client = http_client.get_client()
+        policy = self.retry_policy
+        headers = self._conditional_headers(url) if conditional else None
+        result = None
+
+        for attempt in range(1, policy.max_attempts + 1):
+            retry_after = None
             try:
-                response = await client.get(url)
-                return response.text
+                async with rate_limiter.acquire(url):
+                    started = time.perf_counter()
+                    response, content = await self._request(client, url, headers, kind)
+                    metrics.http_request_seconds.observe(time.perf_counter() - started, kind)
+                rate_limiter.record(url, response.status_code, response.headers.get('Retry-After'))
+                metrics.http_responses.inc(kind, str(response.status_code))
+
+                result = self._to_result(url, response, content)
+                if result.status != FetchStatus.TEMPORARY_ERROR:
+                    return result
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+
+            except ResponseTooLarge as e:
+                metrics.http_errors.inc(kind, type(e).__name__)
+                logger.warning(f'Слишком большой ответ {url}: {e}')
+                return FetchResult(url, FetchStatus.PERMANENT_ERROR, error=repr(e))
+
             except Exception as e:
-                logger.info(f'Ошибка при получении html: {e}')
-                return None
+                metrics.http_errors.inc(kind, type(e).__name__)
+                if not policy.should_retry_exception(e):
+                    # Повтор не поможет (редиректы по кругу, неподдерживаемая схема и т.п.)
+                    logger.warning(f'Ошибка при получении html {url}: {e!r}')
+                    return FetchResult(url, FetchStatus.PERMANENT_ERROR, error=repr(e))
+                result = FetchResult(url, FetchStatus.TEMPORARY_ERROR, error=repr(e))
+
+            if attempt < policy.max_attempts:
+                delay = policy.delay(attempt, retry_after)
+                logger.info(
+                    f'Повтор {attempt}/{policy.max_attempts - 1} для {url} через {delay:.1f} с '
+                    f'({result.error or result.status_code})'
+                )
+                await asyncio.sleep(delay)
+
+        logger.warning(f'Страница недоступна после {policy.max_attempts} попыток: {url} ({result.error or result.status_code})')
+        return result
+
+    @staticmethod
+    def _cutoff_markers(kind: str) -> List[bytes]:
+        if kind != 'product':
+            return []
+        return [marker.encode('ascii') for marker in settings.product_page_cutoff_markers]
+
+    async def _request(
+        self, client: httpx.AsyncClient, url: str, headers: Optional[dict], kind: str
+    ) -> Tuple[httpx.Response, bytes]:
+        """Читает ответ потоком, не больше max_response_bytes.
+
+        Страница товара хранится только до первого маркера конца нужной части:
+        похожие товары и подвал не декодируются и не разбираются. Остаток
+        дочитывается без сохранения, чтобы соединение вернулось в пул.
+        """
+        max_bytes = settings.max_response_bytes
+        async with client.stream('GET', url, headers=headers) as response:
+            if not 200 <= response.status_code < 300:
+                # Нужен только код ответа: тело не храним, а дочитываем, чтобы соединение вернулось
+                # в пул; тело больше max_response_bytes не дочитываем, соединение закрывается
+                received = 0
+                async for chunk in response.aiter_bytes():
+                    received += len(chunk)
+                    if received > max_bytes:
+                        break
+                metrics.http_bytes.inc(kind, amount=received)
+                return response, b''
+
+            markers = self._cutoff_markers(kind)
+            # Страницу с маркерами можно обрезать раньше предела, ее проверяем по мере чтения
+            declared = response.headers.get('Content-Length')
+            if not markers and declared and declared.isdigit() and int(declared) > max_bytes:
+                raise ResponseTooLarge(f'Content-Length {declared}')
+
+            overlap = max((len(marker) for marker in markers), default=1) - 1
+            body = bytearray()
+            received = 0
+            cut = False
+
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if cut:
+                    if received > max_bytes:
+                        # Нужная часть уже есть, огромный остаток не дочитываем
+                        break
+                    continue
+
+                # Маркер может прийти на стыке двух фрагментов
+                search_from = max(0, len(body) - overlap)
+                body += chunk
+                positions = [position for position in (body.find(marker, search_from) for marker in markers) if position >= 0]
+                if positions:
+                    del body[min(positions):]
+                    cut = True
+                if len(body) > max_bytes:
+                    raise ResponseTooLarge(f'больше {max_bytes} байт')
+
+            metrics.http_bytes.inc(kind, amount=received)
+            return response, bytes(body)
+
+    @staticmethod
+    def _conditional_headers(url: str) -> Optional[dict]:
+        if not settings.conditional_requests:
+            return None
+
+        validators = validator_store.get(url)
+        if not validators:
+            return None
+
+        etag, last_modified = validators
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def _to_result(self, url: str, response: httpx.Response, content: bytes) -> FetchResult:
+        status_code = response.status_code
+        if 200 <= status_code < 300:
+            return FetchResult(
+                url, FetchStatus.OK, status_code, content, response.encoding or 'utf-8',
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified'),
+            )
+        if status_code == 304:
+            return FetchResult(url, FetchStatus.NOT_MODIFIED, status_code)
+        if status_code in (404, 410):
+            return FetchResult(url, FetchStatus.NOT_FOUND, status_code)
+        if self.retry_policy.should_retry_status(status_code):
+            return FetchResult(url, FetchStatus.TEMPORARY_ERROR, status_code)
+        return FetchResult(url, FetchStatus.PERMANENT_ERROR, status_code)
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import os
+import socket
+from functools import partial
+from typing import Optional
+
+from src.core.metrics import metrics
+from src.core.settings import settings
+from src.repository.mongo_client import mongo_client
+from src.repository.rate_budget import GlobalRateBudget
+from src.repository.validator_store import validator_store
+from src.repository.work_queue import WorkQueue
+from src.scrapers.http_client import http_client
+from src.scrapers.rate_limiter import rate_limiter
+from src.scrapers.retry import RetryPolicy
+from src.scrapers.scraper import FetchResult, FetchStatus
+from src.services.parser_service import ParserService
+
+logger = logging.getLogger(__name__)
+
+
+class DistributedParserService(ParserService):
+    """Распределенный режим: координатор и любое число воркеров на общей очереди в MongoDB.
+
+    Координатор ставит в очередь категории и следит за ходом обхода:
+    возвращает задачи с истекшей арендой и завершает запуск, когда очередь
+    пуста. Воркеры забирают задачи в аренду, разбирают страницы обычными
+    парсерами и подтверждают или возвращают задачи. Категория и страница
+    листинга ставят в очередь свои товары и следующие страницы, поэтому
+    обход пагинации тоже распределяется между воркерами.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None):
+        super().__init__()
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.queue = WorkQueue(self.worker_id)
+        self.retry_policy = RetryPolicy()
+
+    async def coordinate(self, base_url: str = "https://kanc-mir.ru/"):
+        """Ставит категории в очередь и ждет, пока воркеры обработают все задачи"""
+        try:
+            logger.info("Запуск координатора распределенного обхода")
+            # Координатору нужна только стартовая страница: пул разбора и хеши товаров не загружаем
+            await metrics.start()
+            await mongo_client.connect()
+            await http_client.connect()
+
+            resumed = await self.queue.begin_run()
+            if not resumed:
+                categories = await self.start_parser.get_categories(base_url)
+                added = await self.queue.enqueue(
+                    'categories', {url: {'category': url, 'page': 1} for url in categories}
+                )
+                logger.info(f"Поставлено в очередь категорий: {added}")
+
+            await self._wait_until_drained()
+            await self.queue.finish_run()
+
+        except Exception as e:
+            logger.error(f"Критическая ошибка координатора: {e}")
+        finally:
+            await self._close()
+
+    async def work(self):
+        """Обрабатывает задачи общей очереди, пока координатор не завершит запуск"""
+        reclaimer = None
+        try:
+            logger.info(f"Запуск воркера {self.worker_id}")
+            await self._open()
+            await self.queue.ensure_indexes()
+
+            if settings.global_rate_limit_rps:
+                budget = GlobalRateBudget(settings.global_rate_limit_rps)
+                await budget.ensure_indexes()
+                rate_limiter.global_budget = budget
+
+            await self._wait_for_run()
+            reclaimer = asyncio.create_task(self._reclaim_periodically())
+            await asyncio.gather(*(self._work_loop() for _ in range(settings.work_concurrency)))
+
+            self.repository.log_stats()
+            logger.info(f"Воркер {self.worker_id} завершен")
+
+        except Exception as e:
+            logger.error(f"Критическая ошибка воркера: {e}")
+        finally:
+            if reclaimer:
+                reclaimer.cancel()
+                await asyncio.gather(reclaimer, return_exceptions=True)
+            rate_limiter.global_budget = None
+            await self._close()
+
+    async def _wait_for_run(self):
+        # Воркеры можно запускать раньше координатора
+        while not await self.queue.is_run_active():
+            logger.info("Ожидание запуска координатора")
+            await asyncio.sleep(settings.work_poll_interval * 5)
+        self.repository.crawl_epoch = self.queue.run
+
+    async def _wait_until_drained(self):
+        while True:
+            await self.queue.reclaim_expired()
+            counts = await self.queue.counts()
+            logger.info(
+                f"Очередь: ожидают={counts['pending']}, в работе={counts['leased']}, "
+                f"готово={counts['done']}, ошибок={counts['failed']}"
+            )
+            if not counts['pending'] and not counts['leased']:
+                return
+            await asyncio.sleep(settings.work_poll_interval * 10)
+
+    async def _reclaim_periodically(self):
+        while True:
+            await asyncio.sleep(settings.work_lease_seconds / 2)
+            await self.queue.reclaim_expired()
+
+    async def _work_loop(self):
+        while True:
+            task = await self.queue.claim()
+            if task is None:
+                if not await self.queue.is_run_active():
+                    return
+                await asyncio.sleep(settings.work_poll_interval)
+                continue
+
+            try:
+                if task['stage'] == 'fetch':
+                    await self._process_product(task)
+                else:
+                    await self._process_listing(task)
+            except Exception as e:
+                logger.error(f"Ошибка задачи {task['_id']}: {e}")
+                await self.queue.retry(task, repr(e), self.retry_policy.delay(task['attempts']))
+
+    async def _process_listing(self, task: dict):
+        """Страница листинга (категория - ее первая страница): товары и следующие страницы в очередь"""
+        category_url = task['payload']['category']
+        page_number = task['payload']['page']
+
+        page, page_count = await self.category_parser.fetch_listing_page(category_url, page_number)
+        if page.items is None:
+            await self.queue.retry(task, 'fetch', self.retry_policy.delay(task['attempts']))
+            return
+
+        added = await self.queue.enqueue('fetch', dict.fromkeys(sorted(page.items), {}))
+        logger.info(f"Найдено товаров на странице {page.url}: {len(page.items)}, новых: {added}")
+
+        # Пагинация может показывать только окно номеров: каждая страница добавляет видимые ей
+        last_page = min(page_count, settings.listing_max_pages)
+        await self.queue.enqueue('listings', {
+            self.category_parser.page_url(category_url, number): {'category': category_url, 'page': number}
+            for number in range(page_number + 1, last_page + 1)
+        })
+        await self.queue.ack(task)
+
+    async def _process_product(self, task: dict):
+        product_url = task['_id']
+        await self.repository.wait_writable()
+        result = await self.product_parser.scraper.fetch(product_url, conditional=True, kind='product')
+
+        # Задача подтверждается только после записи пакета с товаром: до этого она в аренде,
+        # и если воркер упадет, координатор вернет ее в очередь
+        if result.ok and result.content:
+            product = await self.parse_pool.parse(result)
+            await self.repository.save_product(product, on_written=partial(self._product_written, task, result))
+        elif result.status == FetchStatus.NOT_MODIFIED:
+            await self.repository.touch(product_url, on_written=partial(self.queue.ack, task))
+        elif result.status == FetchStatus.TEMPORARY_ERROR:
+            await self.queue.retry(task, result.error or str(result.status_code), self.retry_policy.delay(task['attempts']))
+        else:
+            logger.info(f"Товар не загружен: {product_url} ({result.status.value})")
+            await self.queue.fail(task, result.status.value)
+
+    async def _product_written(self, task: dict, result: FetchResult):
+        await validator_store.remember(result.url, result.etag, result.last_modified)
+        await self.queue.ack(task)
@@ -0,0 +1,47 @@
+import asyncio
+import logging
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from src.core.metrics import metrics
+from src.core.settings import settings
+from src.parsers.product_feature import parse_product_page
+from src.schemas.record import ProductRecord
+from src.scrapers.scraper import FetchResult
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker():
+    # Ctrl+C обрабатывает главный процесс, воркеры завершаются через shutdown()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class ParsePool:
+    """Пул процессов для разбора HTML вне event loop"""
+
+    def __init__(self):
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self.executor is None and settings.parse_processes > 0:
+            self.executor = ProcessPoolExecutor(max_workers=settings.parse_processes, initializer=_init_worker)
+            logger.info(f"Пул разбора HTML запущен: процессов={settings.parse_processes}")
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    async def parse(self, result: FetchResult) -> ProductRecord:
+        """Разбирает загруженную страницу товара в пуле (или в текущем потоке, если пул выключен)"""
+        if self.executor is None:
+            product, timings = parse_product_page(result.content, result.encoding, result.url)
+        else:
+            loop = asyncio.get_running_loop()
+            product, timings = await loop.run_in_executor(
+                self.executor, parse_product_page, result.content, result.encoding, result.url
+            )
+        metrics.observe_parse(timings)
+        return product
@@ -1,11 +1,27 @@
 import asyncio
 import logging
+import re
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Dict, List, Optional, Tuple, Union
 
+from src.core.metrics import metrics
+from src.core.settings import settings
 from src.parsers.start_page import StartPageParser
-from src.parsers.category import CategoryPageParser
+from src.parsers.category import CategoryPageParser, ListingPage
 from src.parsers.product_feature import ProductFeatureParser
+from src.parsers.sitemap import SitemapParser
+from src.repository.frontier import Frontier
 from src.repository.mongo_client import mongo_client
 from src.repository.repository import ProductRepository
+from src.repository.validator_store import validator_store
+from src.schemas.record import ProductRecord
+from src.scrapers.http_client import http_client
+from src.scrapers.response_cache import response_cache
+from src.scrapers.scraper import FetchResult, FetchStatus
+from src.services.parse_pool import ParsePool
+from src.services.pipeline import CrawlPipeline, Emit, Handler
+from src.services.seen_urls import SeenUrlSet
 
 logger = logging.getLogger(__name__)
 
@@ -17,96 +33,394 @@ class ParserService:
         self.start_parser = StartPageParser()
         self.category_parser = CategoryPageParser()
         self.product_parser = ProductFeatureParser()
+        self.sitemap_parser = SitemapParser()
+        # Нижняя граница lastmod для режима sitemap (None - все товары)
+        self.sitemap_since: Optional[datetime] = None
         self.repository = ProductRepository()
+        self.parse_pool = ParsePool()
+        self.frontier = Frontier()
 
-        # Задержки между запросами
-        self.delay_between_requests = 0.5
-        self.delay_between_categories = 2.0
+        # Товары, не загруженные из-за временных ошибок, для повторного прохода
+        self.failed_product_urls: List[str] = []
+        # Товары, уже поставленные в очередь в этом запуске (один товар встречается в нескольких категориях)
+        self.seen_products = SeenUrlSet('товаров')
 
     async def start_parsing(self, base_url: str = "https://kanc-mir.ru/"):
         """Запускает полный парсинг сайта"""
         try:
             logger.info("Запуск парсинга КанцМир")
 
-            # Подключаемся к MongoDB
-            await mongo_client.connect()
+            await self._open()
+
+            # Продолжаем незавершенный обход, если он был прерван
+            pending = await self.frontier.begin_run() if settings.frontier_enabled else {}
+            if self.frontier.active:
+                self.repository.crawl_epoch = self.frontier.epoch
 
             # Получаем список категорий
             logger.info("Получение списка категорий")
             categories = await self.start_parser.get_categories(base_url)
             logger.info(f"Найдено категорий: {len(categories)}")
 
-            # Обрабатываем каждую категорию
-            for i, category_url in enumerate(categories, 1):
-                logger.info(f"Обработка категории {i}/{len(categories)}: {category_url}")
-                await self._process_category(category_url)
-
-                # Задержка между категориями
-                if i < len(categories):
-                    await asyncio.sleep(self.delay_between_categories)
+            # Категории обрабатываются конвейером параллельно
+            await self._run_pipeline(categories, pending)
 
+            if self.frontier.active:
+                # Эпоха завершается только после записи всех товаров и отметок о них
+                await self.repository.drain()
+                await self.frontier.finish_run()
             logger.info("Парсинг завершен")
 
         except Exception as e:
             logger.error(f"Критическая ошибка в парсинге: {e}")
         finally:
-            await mongo_client.disconnect()
+            await self._close()
+
+    async def refresh_prices(self, base_url: str = "https://kanc-mir.ru/"):
+        """Обновляет цены и наличие по страницам листинга.
+
+        Страницы товаров загружаются только для URL, которых еще нет в базе;
+        у известных товаров обновляются только цена и наличие.
+        """
+        try:
+            logger.info("Запуск обновления цен КанцМир")
+
+            await self._open()
+            await self.repository.load_offers()
+
+            categories = await self.start_parser.get_categories(base_url)
+            logger.info(f"Найдено категорий: {len(categories)}")
+
+            # Граница обхода не ведется: режим быстрый, прерванный запуск проще повторить
+            await self._run_pipeline(categories, listing_handler=self._handle_listing_prices)
+
+            logger.info("Обновление цен завершено")
+
+        except Exception as e:
+            logger.error(f"Критическая ошибка при обновлении цен: {e}")
+        finally:
+            await self._close()
+
+    async def crawl_sitemaps(self, base_url: str = "https://kanc-mir.ru/"):
+        """Загружает товары из sitemap сайта без обхода категорий и листингов.
+
+        URL товаров из sitemap сразу идут на стадию загрузки. В инкрементальном
+        режиме берутся только записи с lastmod после начала прошлого успешного
+        запуска; записи без lastmod берутся всегда.
+        """
+        try:
+            logger.info("Запуск парсинга по sitemap КанцМир")
+            started_at = datetime.now(timezone.utc)
+
+            await self._open()
+            self.sitemap_since = await self._sitemap_since()
+            if self.sitemap_since is not None:
+                logger.info(f"Товары, измененные после {self.sitemap_since.isoformat()}")
+
+            sitemap_urls = await self.sitemap_parser.get_sitemap_urls(base_url)
+            self.sitemap_parser.failed = []
+            self.failed_product_urls = []
+            self.seen_products = SeenUrlSet('товаров')
+
+            queue_size = settings.pipeline_queue_size
+            pipeline = CrawlPipeline()
+            pipeline.add_stage('sitemaps', self._handle_sitemap, settings.sitemap_workers, queue_size)
+            pipeline.add_stage('fetch', self._handle_fetch, settings.fetch_workers, queue_size)
+            pipeline.add_stage('parse', self._handle_parse, settings.parse_workers, queue_size)
+            pipeline.add_stage('save', self._handle_save, settings.save_workers, queue_size)
+            await pipeline.run(sitemap_urls)
+            pipeline.log_stats()
+
+            await self._requeue_failed()
+            self.seen_products.log_stats()
+            self.repository.log_stats()
+
+            # Недочитанный sitemap или незагруженные товары: следующий запуск должен снова взять их записи
+            if self.sitemap_parser.failed or self.failed_product_urls:
+                logger.warning("Не все sitemap и товары обработаны, отметка времени не сдвигается")
+            else:
+                await self._state_collection().update_one(
+                    {'_id': 'sitemap'}, {'$set': {'last_started_at': started_at}}, upsert=True
+                )
+            logger.info("Парсинг по sitemap завершен")
+
+        except Exception as e:
+            logger.error(f"Критическая ошибка при парсинге по sitemap: {e}")
+        finally:
+            await self._close()
+
+    async def replay(self):
+        """Пересобирает товары из локального кеша ответов без обращения к сайту.
+
+        Нужен для проверки изменений в разборе страниц: весь каталог
+        разбирается заново за минуты, а сайт не получает ни одного запроса.
+        Страницы в кеше могут быть устаревшими, поэтому каталог не меняется:
+        товары, разобранные иначе, чем в нем, пишутся в replay_collection_name.
+        """
+        try:
+            logger.info(f"Разбор товаров из кеша ответов: {response_cache.directory}")
+
+            # HTTP клиент, валидаторы и граница обхода в этом режиме не нужны
+            await metrics.start()
+            await mongo_client.connect()
+            self.parse_pool.start()
+
+            # Коллекция содержит только отличия последнего разбора
+            self.repository = ProductRepository(diff_collection=settings.replay_collection_name)
+            await mongo_client.database.drop_collection(settings.replay_collection_name)
+            await self.repository.collection.create_index('article', unique=True)
+            await self.repository.start()
+
+            queue_size = settings.pipeline_queue_size
+            pipeline = CrawlPipeline()
+            pipeline.add_stage('load', self._handle_cached_page, settings.fetch_workers, queue_size)
+            pipeline.add_stage('parse', self._handle_parse, settings.parse_workers, queue_size)
+            pipeline.add_stage('save', self._handle_save, settings.save_workers, queue_size)
+
+            await pipeline.run(response_cache.iter_paths('product'))
+            pipeline.log_stats()
+            self.repository.log_stats()
+
+            logger.info(f"Разбор из кеша завершен, отличия от каталога в коллекции {settings.replay_collection_name}")
+
+        except Exception as e:
+            logger.error(f"Критическая ошибка при разборе из кеша: {e}")
+        finally:
+            await self._close()
 
     async def parse_single_category(self, category_url: str):
         """Парсит одну категорию"""
         try:
             logger.info(f"Парсинг категории: {category_url}")
 
-            # Подключаемся к MongoDB
-            await mongo_client.connect()
+            await self._open()
 
             # Обрабатываем категорию
-            await self._process_category(category_url)
+            await self._run_pipeline([category_url])
 
             logger.info("Парсинг категории завершен")
 
         except Exception as e:
             logger.error(f"Ошибка при парсинге категории: {e}")
         finally:
-            await mongo_client.disconnect()
+            await self._close()
 
-    async def _process_category(self, category_url: str):
-        """Обрабатывает одну категорию"""
-        try:
-            # Получаем все страницы категории
-            page_links = await self.category_parser.create_page_links(category_url)
-            logger.info(f"Найдено страниц: {len(page_links)}")
+    async def _open(self):
+        """Подключается к MongoDB, открывает общий HTTP клиент и пул разбора"""
+        await metrics.start()
+        await mongo_client.connect()
+        await http_client.connect()
+        await validator_store.load()
+        await response_cache.open()
+        self.parse_pool.start()
+        await self.repository.start()
 
-            # Обрабатываем каждую страницу
-            for page_num, page_url in enumerate(page_links, 1):
-                logger.info(f"Обработка страницы {page_num}/{len(page_links)}")
+    async def _close(self):
+        self.parse_pool.shutdown()
+        await http_client.disconnect()
+        # Финальный сброс буфера до закрытия соединения с MongoDB
+        await self.repository.close()
+        await self.frontier.close()
+        await validator_store.flush()
+        await mongo_client.disconnect()
+        metrics.log_summary()
+        await metrics.stop()
 
-                # Получаем товары со страницы
-                product_links = await self.category_parser.get_product_links(page_url)
-                logger.info(f"Найдено товаров на странице: {len(product_links)}")
+    def _build_pipeline(self, listing_handler: Optional[Handler] = None) -> CrawlPipeline:
+        """Собирает конвейер: категории -> страницы листинга -> загрузка -> разбор -> сохранение"""
+        queue_size = settings.pipeline_queue_size
+        pipeline = CrawlPipeline()
+        pipeline.add_stage('categories', self._handle_category, settings.category_workers, queue_size)
+        pipeline.add_stage('listings', listing_handler or self._handle_listing_page, settings.listing_workers, queue_size)
+        pipeline.add_stage('fetch', self._handle_fetch, settings.fetch_workers, queue_size)
+        pipeline.add_stage('parse', self._handle_parse, settings.parse_workers, queue_size)
+        pipeline.add_stage('save', self._handle_save, settings.save_workers, queue_size)
+        return pipeline
 
-                # Парсим товары со страницы
-                for product_url in product_links:
-                    await self._process_product(product_url)
-                    await asyncio.sleep(self.delay_between_requests)
+    async def _run_pipeline(
+        self,
+        category_urls,
+        pending: Optional[Dict[str, List[str]]] = None,
+        listing_handler: Optional[Handler] = None,
+    ):
+        self.failed_product_urls = []
+        self.seen_products = SeenUrlSet('товаров')
 
-            logger.info("Категория обработана")
+        # Незавершенные URL прерванного обхода плюс категории, еще не обработанные в этой эпохе
+        seeds = dict(pending or {})
+        categories = []
+        for category_url in dict.fromkeys([*seeds.get('categories', []), *category_urls]):
+            if not self.frontier.is_finished(category_url):
+                await self.frontier.add(category_url, 'categories')
+                categories.append(category_url)
+        seeds['categories'] = categories
+        for product_url in seeds.get('fetch', ()):
+            self.seen_products.add(product_url)
 
-        except Exception as e:
-            logger.error(f"Ошибка при обработке категории {category_url}: {e}")
+        pipeline = self._build_pipeline(listing_handler)
+        await pipeline.run_many(seeds)
+        pipeline.log_stats()
 
-    async def _process_product(self, product_url: str):
-        """Обрабатывает один товар"""
-        try:
-            # Парсим товар
-            product = await self.product_parser.parse_product(product_url)
+        await self._requeue_failed()
+        self.seen_products.log_stats()
+        self.repository.log_stats()
+
+    async def _requeue_failed(self):
+        """Повторно ставит в очередь только товары с временными ошибками"""
+        for round_number in range(1, settings.requeue_rounds + 1):
+            if not self.failed_product_urls:
+                break
+
+            failed, self.failed_product_urls = self.failed_product_urls, []
+            logger.info(f"Повторная загрузка товаров ({round_number}/{settings.requeue_rounds}): {len(failed)}")
+            pipeline = self._build_pipeline()
+            await pipeline.run(failed, stage_name='fetch')
+            pipeline.log_stats()
+
+        if self.failed_product_urls:
+            logger.warning(f"Не удалось загрузить товаров: {len(self.failed_product_urls)}")
+
+    async def _handle_category(self, category_url: str, emit: Emit):
+        """Загружает страницы категории и передает их дальше по мере готовности"""
+        logger.info(f"Обработка категории: {category_url}")
+        page_count = 0
+
+        # Страницы загружаются параллельно, товары первых страниц уходят в работу сразу
+        async for page in self.category_parser.iter_listing_pages(category_url):
+            page_count += 1
+            if self.frontier.is_finished(page.url):
+                continue
+            await self.frontier.add(page.url, 'listings')
+            # Незагруженную страницу стадия листинга попробует загрузить еще раз
+            await emit(page if page.items is not None else page.url)
+
+        logger.info(f"Найдено страниц: {page_count} в {category_url}")
+        await self.frontier.mark_done(category_url, 'categories')
+
+    async def _load_listing_page(self, item: Union[str, ListingPage]) -> Optional[ListingPage]:
+        """Возвращает загруженную страницу листинга; URL из прерванного обхода загружает"""
+        page = item if isinstance(item, ListingPage) else await self.category_parser.get_listing_page(item)
+        if page.items is None:
+            logger.warning(f"Не удалось загрузить страницу листинга: {page.url}")
+            await self.frontier.mark_failed(page.url, 'listings', 'fetch', retry=True)
+            return None
+        return page
+
+    async def _handle_sitemap(self, sitemap_url: str, emit: Emit):
+        """Передает на загрузку товары из sitemap (и вложенных индексов) по мере чтения"""
+        pattern = re.compile(settings.sitemap_product_url_pattern) if settings.sitemap_product_url_pattern else None
+        found = 0
+        async for product_url in self.sitemap_parser.iter_page_urls(sitemap_url, self.sitemap_since, pattern):
+            found += 1
+            if self.seen_products.add(product_url):
+                await self._emit_url(emit, product_url, 'fetch')
+        logger.info(f"Товаров в {sitemap_url}: {found}")
 
-            if product:
-                # Сохраняем в базу данных
-                await self.repository.save_product(product)
-                logger.info(f"Сохранен товар: {product.article}")
+    async def _sitemap_since(self) -> Optional[datetime]:
+        if not settings.sitemap_incremental:
+            return None
+        state = await self._state_collection().find_one({'_id': 'sitemap'})
+        if not state or not state.get('last_started_at'):
+            return None
+        last_started_at = state['last_started_at'].replace(tzinfo=timezone.utc)
+        return last_started_at - timedelta(seconds=settings.sitemap_lastmod_overlap)
+
+    @staticmethod
+    def _state_collection():
+        return mongo_client.get_collection(settings.crawl_state_collection_name)
+
+    async def _handle_listing_page(self, item: Union[str, ListingPage], emit: Emit):
+        """Передает товары страницы листинга на загрузку"""
+        page = await self._load_listing_page(item)
+        if page is None:
+            return
+        logger.info(f"Найдено товаров на странице {page.url}: {len(page.items)}")
+
+        for product_url in sorted(page.items):
+            # Каждый товар загружается один раз за запуск, в какой бы категории он ни встретился
+            if self.seen_products.add(product_url):
+                await self._emit_url(emit, product_url, 'fetch')
+
+        await self.frontier.mark_done(page.url, 'listings')
+
+    async def _handle_listing_prices(self, item: Union[str, ListingPage], emit: Emit):
+        """Обновляет цену и наличие товаров прямо со страницы листинга"""
+        page = await self._load_listing_page(item)
+        if page is None:
+            return
+
+        for product_url in sorted(page.items):
+            if not self.seen_products.add(product_url):
+                continue
+            listing_item = page.items[product_url]
+            if self.repository.is_known_url(product_url):
+                await self.repository.update_offer(product_url, listing_item.price, listing_item.stock)
             else:
-                logger.warning(f"Не удалось спарсить товар: {product_url}")
+                # Новый товар: нужна полная страница
+                await self._emit_url(emit, product_url, 'fetch')
 
-        except Exception as e:
-            logger.error(f"Ошибка при обработке товара {product_url}: {e}")
\ No newline at end of file
+    async def _handle_fetch(self, product_url: str, emit: Emit):
+        """Загружает страницу товара"""
+        # Запись в MongoDB отстает: не загружаем новые страницы, пока писатель не освободится
+        await self.repository.wait_writable()
+        # Нагрузку на сайт ограничивает rate limiter в PageScraper
+        # URL, которого нет в базе, загружается без валидаторов: 304 не дал бы создать товар
+        conditional = self.repository.use_conditional(product_url)
+        result = await self.product_parser.scraper.fetch(product_url, conditional=conditional, kind='product')
+
+        if result.ok and result.content:
+            await emit(result)
+        elif result.status == FetchStatus.NOT_MODIFIED:
+            # Страница не менялась: разбор и запись не нужны; URL завершен, когда записан last_seen
+            await self.repository.touch(product_url, on_written=partial(self.frontier.mark_done, product_url, 'fetch'))
+        elif result.status == FetchStatus.TEMPORARY_ERROR:
+            self.failed_product_urls.append(product_url)
+            await self.frontier.mark_failed(product_url, 'fetch', result.error or str(result.status_code), retry=True)
+        else:
+            if result.status == FetchStatus.NOT_FOUND:
+                logger.info(f"Товар не найден: {product_url}")
+            else:
+                logger.warning(f"Не удалось загрузить товар: {product_url} ({result.status_code})")
+            await self.frontier.mark_failed(product_url, 'fetch', result.status.value, retry=False)
+
+    async def _handle_cached_page(self, path: str, emit: Emit):
+        """Читает страницу товара из локального кеша"""
+        cached = await asyncio.to_thread(response_cache.read, path)
+        if cached is None:
+            return
+
+        await emit(FetchResult(
+            cached.url, FetchStatus.OK, cached.status_code, cached.content, cached.encoding,
+            etag=cached.etag, last_modified=cached.last_modified,
+        ))
+
+    async def _handle_parse(self, result: FetchResult, emit: Emit):
+        """Разбирает HTML страницы товара в пуле процессов"""
+        product = await self.parse_pool.parse(result)
+
+        if product:
+            await emit((product, result))
+        else:
+            logger.warning(f"Не удалось спарсить товар: {result.url}")
+
+    async def _handle_save(self, item: Tuple[ProductRecord, FetchResult], emit: Emit):
+        """Сохраняет товар в базу данных"""
+        product, fetch_result = item
+        result = await self.repository.save_product(product, on_written=partial(self._product_written, fetch_result))
+        logger.debug(f"Товар {product.article}: {result.value}")
+
+    async def _product_written(self, fetch_result: FetchResult):
+        """Пакет с товаром записан в базу.
+
+        Валидаторы и отметка о завершении ставятся только теперь: иначе 304 или
+        продолжение прерванной эпохи скроют товар, который так и не был записан.
+        """
+        await validator_store.remember(fetch_result.url, fetch_result.etag, fetch_result.last_modified)
+        await self.frontier.mark_done(fetch_result.url, 'fetch')
+
+    async def _emit_url(self, emit: Emit, url: str, stage: str):
+        """Передает URL следующей стадии, если он еще не обработан в текущей эпохе"""
+        if self.frontier.is_finished(url):
+            return
+        await self.frontier.add(url, stage)
+        await emit(url)
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+Emit = Callable[[Any], Awaitable[None]]
+Handler = Callable[[Any, Emit], Awaitable[None]]
+
+
+class Stage:
+    """Стадия конвейера: ограниченная очередь и пул воркеров"""
+
+    def __init__(self, name: str, handler: Handler, workers: int, queue_size: int):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.next_stage: Optional['Stage'] = None
+        self.processed = 0
+        self.errors = 0
+
+    async def emit(self, item: Any):
+        """Передает элемент в следующую стадию (ждет, если ее очередь заполнена)"""
+        if self.next_stage is not None:
+            await self.next_stage.queue.put(item)
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            started = time.perf_counter()
+            try:
+                await self.handler(item, self.emit)
+                self.processed += 1
+                metrics.stage_items.inc(self.name)
+            except Exception as e:
+                self.errors += 1
+                metrics.stage_errors.inc(self.name)
+                logger.error(f"Ошибка на стадии {self.name}: {e}")
+            finally:
+                # Время включает ожидание места в очереди следующей стадии (обратное давление)
+                metrics.stage_seconds.observe(time.perf_counter() - started, self.name)
+                self.queue.task_done()
+
+
+class CrawlPipeline:
+    """Конвейер из последовательных стадий, связанных ограниченными очередями.
+
+    Каждая стадия передает результаты следующей через emit(). Ограниченный
+    размер очередей дает обратное давление: быстрые стадии ждут медленные,
+    и объем данных в памяти не растет.
+    """
+
+    def __init__(self):
+        self.stages: List[Stage] = []
+
+    def add_stage(self, name: str, handler: Handler, workers: int, queue_size: int) -> Stage:
+        stage = Stage(name, handler, workers, queue_size)
+        metrics.queue_depth.track(name, function=stage.queue.qsize)
+        if self.stages:
+            self.stages[-1].next_stage = stage
+        self.stages.append(stage)
+        return stage
+
+    def get_stage(self, name: str) -> Stage:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    async def run(self, seeds: Iterable[Any], stage_name: Optional[str] = None):
+        """Подает seeds на вход стадии и ждет, пока весь конвейер опустеет"""
+        await self.run_many({stage_name or self.stages[0].name: seeds})
+
+    async def run_many(self, seeds_by_stage: Dict[str, Iterable[Any]]):
+        """Подает элементы сразу в несколько стадий (например, при продолжении обхода)"""
+        tasks = [
+            asyncio.create_task(stage._worker(), name=f"{stage.name}-{i}")
+            for stage in self.stages
+            for i in range(stage.workers)
+        ]
+        try:
+            # Сначала наполняем более поздние стадии, чтобы начатая работа завершалась раньше
+            for stage in reversed(self.stages):
+                for item in seeds_by_stage.get(stage.name, ()):
+                    await stage.queue.put(item)
+
+            # Стадии завершаются по порядку: после join() предыдущей
+            # стадии в следующую больше ничего не поступит
+            for stage in self.stages:
+                await stage.queue.join()
+        finally:
+            # При отмене (Ctrl+C) или ошибке корректно останавливаем воркеров
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def log_stats(self):
+        for stage in self.stages:
+            logger.info(f"Стадия {stage.name}: обработано={stage.processed}, ошибок={stage.errors}")
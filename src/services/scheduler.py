@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from functools import partial
+
+from src.core.settings import settings
+from src.repository.recrawl_schedule import RecrawlSchedule
+from src.repository.repository import SaveResult
+from src.repository.validator_store import validator_store
+from src.scrapers.rate_limiter import HourlyBudget, rate_limiter
+from src.scrapers.scraper import FetchStatus
+from src.services.parser_service import ParserService
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerService(ParserService):
+    """Долгоживущий режим: товары перепроверяются по расписанию, а не всем каталогом.
+
+    Раз в schedule_discovery_interval обходятся листинги: новые товары
+    ставятся в расписание первыми, у известных обновляются цена и наличие.
+    Воркеры забирают из расписания URL со наступившим сроком; часто
+    меняющиеся товары проверяются чаще стабильных. Все запросы к сайту
+    укладываются в общий бюджет schedule_requests_per_hour.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.schedule = RecrawlSchedule()
+        # Подряд идущие временные ошибки по URL, для задержки повтора
+        self._failures = {}
+
+    async def run_forever(self, base_url: str = "https://kanc-mir.ru/"):
+        tasks = []
+        try:
+            logger.info(f"Запуск режима расписания: бюджет {settings.schedule_requests_per_hour or 'не ограничен'} запросов в час")
+            await self._open()
+            await self.repository.load_offers()
+            await self.schedule.start()
+            if settings.schedule_requests_per_hour > 0:
+                rate_limiter.global_budget = HourlyBudget(settings.schedule_requests_per_hour)
+
+            tasks.append(asyncio.create_task(self._discover_periodically(base_url)))
+            tasks.extend(asyncio.create_task(self._recrawl_loop()) for _ in range(settings.fetch_workers))
+            await asyncio.gather(*tasks)
+
+        except Exception as e:
+            logger.error(f"Критическая ошибка режима расписания: {e}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            rate_limiter.global_budget = None
+            await self.schedule.close()
+            await self._close()
+
+    async def _discover_periodically(self, base_url: str):
+        while True:
+            try:
+                await self._discover(base_url)
+            except Exception as e:
+                logger.error(f"Ошибка обхода листингов: {e}")
+            await asyncio.sleep(settings.schedule_discovery_interval)
+
+    async def _discover(self, base_url: str):
+        """Обходит листинги: новые URL в расписание, цены известных товаров обновляет"""
+        categories = await self.start_parser.get_categories(base_url)
+        added = 0
+
+        for category_url in categories:
+            async for page in self.category_parser.iter_listing_pages(category_url):
+                if page.items is None:
+                    continue
+                for product_url, listing_item in page.items.items():
+                    known = self.repository.is_known_url(product_url)
+                    if await self.schedule.add(product_url, known=known):
+                        added += 1
+                    elif known and await self.repository.update_offer(product_url, listing_item.price, listing_item.stock):
+                        # Цена в листинге изменилась: это тоже наблюдение изменения товара
+                        await self.schedule.record(product_url, changed=True)
+
+        logger.info(
+            f"Обход листингов завершен: категорий {len(categories)}, добавлено URL {added}, "
+            f"в расписании {len(self.schedule)}, к проверке {self.schedule.due_count()}"
+        )
+        self.repository.log_stats()
+
+    async def _recrawl_loop(self):
+        while True:
+            product_url = await self.schedule.next_due()
+            try:
+                await self._recrawl(product_url)
+            except Exception as e:
+                logger.error(f"Ошибка проверки товара {product_url}: {e}")
+                await self._postpone(product_url)
+
+    async def _recrawl(self, product_url: str):
+        await self.repository.wait_writable()
+        conditional = self.repository.use_conditional(product_url)
+        result = await self.product_parser.scraper.fetch(product_url, conditional=conditional, kind='product')
+
+        if result.ok and result.content:
+            product = await self.parse_pool.parse(result)
+            # Валидаторы - только после записи товара, иначе 304 скроет несохраненный товар
+            save_result = await self.repository.save_product(product, on_written=partial(
+                validator_store.remember, result.url, result.etag, result.last_modified
+            ))
+            self._failures.pop(product_url, None)
+            # Новый товар - первое наблюдение, а не изменение: интервал не сокращается
+            await self.schedule.record(product_url, changed=save_result == SaveResult.CHANGED)
+        elif result.status == FetchStatus.NOT_MODIFIED:
+            await self.repository.touch(product_url)
+            self._failures.pop(product_url, None)
+            await self.schedule.record(product_url, changed=False)
+        elif result.status == FetchStatus.TEMPORARY_ERROR:
+            await self._postpone(product_url)
+        else:
+            logger.info(f"Товар убран из расписания: {product_url} ({result.status.value})")
+            self._failures.pop(product_url, None)
+            await self.schedule.remove(product_url)
+
+    async def _postpone(self, product_url: str):
+        failures = self._failures[product_url] = self._failures.get(product_url, 0) + 1
+        if failures >= settings.schedule_max_failures:
+            logger.info(f"Товар убран из расписания после {failures} ошибок подряд: {product_url}")
+            self._failures.pop(product_url, None)
+            await self.schedule.remove(product_url)
+            return
+        await self.schedule.postpone(product_url, failures)
@@ -0,0 +1,44 @@
+import hashlib
+import logging
+from typing import Set
+
+logger = logging.getLogger(__name__)
+
+
+class SeenUrlSet:
+    """Множество уже встреченных URL в пределах одного запуска.
+
+    Вместо строк хранятся 64-битные хеши URL: это в несколько раз компактнее,
+    а вероятность коллизии на сотнях тысяч товаров пренебрежимо мала.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._hashes: Set[int] = set()
+        self.checks = 0
+        self.hits = 0
+
+    @staticmethod
+    def _key(url: str) -> int:
+        url = url.split('#', 1)[0]
+        return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def add(self, url: str) -> bool:
+        """Добавляет URL; возвращает False, если он уже встречался"""
+        key = self._key(url)
+        self.checks += 1
+        if key in self._hashes:
+            self.hits += 1
+            return False
+        self._hashes.add(key)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def log_stats(self):
+        hit_rate = self.hits / self.checks * 100 if self.checks else 0.0
+        logger.info(
+            f"Дедупликация {self.name}: уникальных={len(self._hashes)}, "
+            f"повторов={self.hits} из {self.checks} ({hit_rate:.1f}%)"
+        )